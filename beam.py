@@ -0,0 +1,136 @@
+# /**
+#  * A <code>Beam</code> holds the best {@link #capacity} {@link HmmVoiceSplittingModelState}s seen so far.
+#  * <p>
+#  * It is a min-heap keyed on (score, -number of voices, -insertion order), so the worst state is always at
+#  * the root. A candidate can be checked against that root with {@link #accepts(float, int)} before the
+#  * state is even built, and inserting into a full beam replaces the root in O(log capacity).
+#  * Ties are resolved in favour of fewer voices, and then of the state which arrived first.
+#  * <p>
+#  * With recombination enabled, the beam also keeps only the best state for each frontier signature
+#  * (see {@link HmmVoiceSplittingModelState#getFrontierSignature()}), Viterbi style. States which differ
+#  * only in their history score every future note identically, so the others can never overtake it.
+#  * Each entry then also keeps its position in the heap, so that a duplicate which is replaced by a better
+#  * state is sifted into place in O(log capacity), rather than the whole heap being rebuilt. Until the beam
+#  * is full, nothing is dropped, so its entries are only put in heap order once it fills up.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import heapq
+
+
+class Beam:
+
+    def __init__(self, capacity, recombine=False):
+        self.__capacity = capacity      # The maximum number of states kept.
+        self.__recombine = recombine    # True to keep only the best state per frontier signature.
+        self.__heap = []                # Entries [score, -numVoices, -order, state, signature, position], worst first.
+        self.__bySignature = {}         # Frontier signature -> the heap entry holding it, if recombining.
+        self.__count = 0                # The number of states offered so far, used to break ties.
+
+    # /**
+    #  * Decide whether a state with the given score and number of voices would enter this beam.
+    #  *
+    #  * @param score The log probability of the candidate state.
+    #  * @param numVoices The number of voices of the candidate state.
+    #  * @return True if the candidate would be kept. False otherwise.
+    #  */
+
+    def accepts(self, score, numVoices):
+        if len(self.__heap) < self.__capacity:
+            return True
+        if not self.__heap:
+            return False
+        worst = self.__heap[0]
+        return score > worst[0] or (score == worst[0] and -numVoices > worst[1])
+
+    # /**
+    #  * Offer the given state to this beam, dropping the worst state if it is full. If recombining, a
+    #  * state whose frontier signature is already in the beam replaces it only if it is better.
+    #  *
+    #  * @param state The state to add.
+    #  * @return True if the state was kept. False otherwise.
+    #  */
+
+    def add(self, state):
+        score = state.get_score()
+        numVoices = len(state.getVoices())
+        if not self.accepts(score, numVoices):
+            return False
+        self.__count += 1
+        signature = state.getFrontierSignature() if self.__recombine else None
+        entry = [score, -numVoices, -self.__count, state, signature, 0]
+
+        if not self.__recombine:
+            if len(self.__heap) < self.__capacity:
+                heapq.heappush(self.__heap, entry)
+            else:
+                heapq.heapreplace(self.__heap, entry)
+            return True
+
+        old = self.__bySignature.get(signature)
+        if old is not None:
+            if (score, -numVoices) <= (old[0], old[1]):
+                return False
+            # Replace the worse duplicate in place. Its key only improves, so it can only move down.
+            old[:5] = entry[:5]
+            if len(self.__heap) == self.__capacity:
+                self.__siftDown(old[5])
+            return True
+        self.__bySignature[signature] = entry
+
+        if len(self.__heap) < self.__capacity:
+            self.__heap.append(entry)
+            if len(self.__heap) == self.__capacity:
+                heapq.heapify(self.__heap)
+                for position, heapEntry in enumerate(self.__heap):
+                    heapEntry[5] = position
+        else:
+            del self.__bySignature[self.__heap[0][4]]
+            self.__heap[0] = entry
+            self.__siftDown(0)
+        return True
+
+    # /**
+    #  * Move the entry at the given position of the heap towards the leaves until neither of its children is
+    #  * worse, keeping the positions of the entries up to date.
+    #  *
+    #  * @param position The position of the entry in the heap.
+    #  */
+
+    def __siftDown(self, position):
+        heap = self.__heap
+        entry = heap[position]
+        size = len(heap)
+        child = 2 * position + 1
+        while child < size:
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < entry:
+                break
+            heap[position] = heap[child]
+            heap[position][5] = position
+            position = child
+            child = 2 * position + 1
+        heap[position] = entry
+        entry[5] = position
+
+    # /**
+    #  * Get the states in this beam, best first.
+    #  *
+    #  * @return A List of the states in this beam, ordered from the highest score to the lowest.
+    #  */
+
+    def getStates(self):
+        return [entry[3] for entry in sorted(self.__heap, reverse=True)]
+
+    def getCapacity(self):
+        return self.__capacity
+
+    def isEmpty(self):
+        return len(self.__heap) == 0
+
+    def __len__(self):
+        return len(self.__heap)
@@ -0,0 +1,280 @@
+# /**
+#  * A <code>Benchmark</code> measures the throughput of the whole voice splitting pipeline on synthetic MIDI files
+#  * (see {@link SyntheticMidiGenerator}), to show how the model scales with polyphony and length.
+#  * <p>
+#  * Each case generates some files with the given settings and runs them through {@link EventParser} and
+#  * {@link NoteListGenerator} (the parse stage), onset grouping (the group stage), {@link HmmVoiceSplittingModel}
+#  * (the split stage) and scoring against the gold standard (the score stage). It reports the time of each
+#  * stage, notes per second, the search effort (the expansions spent, see {@link ComputeBudget}, in total, per
+#  * onset on average and at the worst onset), the peak number of live hypotheses, of distinct live
+#  * {@link Voice} nodes across them and of voices, the F1, and the peak resident set size of the process.
+#  * Counting the live Voice nodes walks every hypothesis, so it is left out of the split time. With -i, every
+#  * case runs in a fresh process, so that the peak RSS is that of the case alone rather than of every case so far.
+#  * <p>
+#  * The results are written as JSON, to stdout or to a file.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where the peak RSS is not reported
+    resource = None
+
+from eventparser import EventParser
+from goldstandard import GoldStandard
+from hmmvoicesplittingmodel import HmmVoiceSplittingModel
+from hmmvoicesplittingmodelparameters import HmmVoiceSplittingModelParameters
+from notelistgenerator import NoteListGenerator
+from syntheticmidigenerator import SyntheticMidiGenerator
+from timetracker import TimeTracker
+
+
+class Benchmark:
+
+    STAGES = ('parse', 'group', 'split', 'score')   # The stages of the pipeline, in order.
+
+    def __init__(self, params, useChannel=True):
+        self.__params = params          # The model parameters to use.
+        self.__useChannel = useChannel  # True to use channels as the correct voice, False for tracks.
+
+    # /**
+    #  * Run a case: generate its files, and run each through the whole pipeline.
+    #  *
+    #  * @param generator The {@link SyntheticMidiGenerator} with the settings of the case.
+    #  * @param numSongs The number of files to generate, with seeds generator.seed, generator.seed + 1, ...
+    #  * @param directory The directory to write the files to.
+    #  * @return A dict of the settings and measurements of the case.
+    #  */
+
+    def runCase(self, generator, numSongs, directory):
+        seconds = dict((stage, 0.0) for stage in self.STAGES)
+        numNotes = 0
+        numOnsets = 0
+        maxOnsetSize = 0
+        expansions = 0
+        peakOnsetExpansions = 0
+        peakHypotheses = 0
+        peakVoiceNodes = 0
+        peakVoices = 0
+        f1Sum = 0.0
+
+        for song in range(numSongs):
+            path = os.path.join(directory, '%d-%d-%d.mid' % (generator.numVoices, generator.seed, song))
+            generator.write(path, generator.seed + song)
+
+            start = time.perf_counter()
+            tt = TimeTracker()
+            nlg = NoteListGenerator(tt)
+            ep = EventParser(path, nlg, tt, self.__useChannel)
+            ep.run()
+            seconds['parse'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            incomingLists = nlg.getIncomingLists()
+            seconds['group'] += time.perf_counter() - start
+
+            model = HmmVoiceSplittingModel(self.__params)
+            budget = model.get_budget()
+            for incoming in incomingLists:
+                start = time.perf_counter()
+                model.handle_incoming(list(incoming))
+                seconds['split'] += time.perf_counter() - start
+                hypotheses = model.get_hypotheses()
+                peakOnsetExpansions = max(peakOnsetExpansions, budget.getOnsetExpansions())
+                peakHypotheses = max(peakHypotheses, len(hypotheses))
+                peakVoiceNodes = max(peakVoiceNodes, self.getNumVoiceNodes(hypotheses))
+                if hypotheses:
+                    peakVoices = max(peakVoices, len(hypotheses[0].getVoices()))
+            expansions += budget.getSongExpansions()
+
+            start = time.perf_counter()
+            f1Sum += model.getF1(GoldStandard(ep.goldStandard)) if model.get_hypotheses() else 0.0
+            seconds['score'] += time.perf_counter() - start
+
+            numNotes += len(nlg.getNoteList())
+            numOnsets += len(incomingLists)
+            maxOnsetSize = max([maxOnsetSize] + [len(incoming) for incoming in incomingLists])
+
+        total = sum(seconds.values())
+        return {'voices': generator.numVoices, 'chordDensity': generator.chordDensity,
+                'crossingProbability': generator.crossingProbability, 'tempoChanges': generator.numTempoChanges,
+                'beats': generator.numBeats, 'seed': generator.seed, 'songs': numSongs,
+                'notes': numNotes, 'onsets': numOnsets, 'maxOnsetSize': maxOnsetSize,
+                'seconds': seconds, 'totalSeconds': total,
+                'notesPerSecond': numNotes / total if total > 0 else None,
+                'splitNotesPerSecond': numNotes / seconds['split'] if seconds['split'] > 0 else None,
+                'expansions': expansions,
+                'expansionsPerOnset': expansions / numOnsets if numOnsets > 0 else None,
+                'peakOnsetExpansions': peakOnsetExpansions, 'peakHypotheses': peakHypotheses,
+                'peakVoiceNodes': peakVoiceNodes, 'peakVoices': peakVoices,
+                'f1': f1Sum / numSongs if numSongs > 0 else None,
+                'peakRssBytes': self.getPeakRss()}
+
+    # /**
+    #  * Count the distinct {@link Voice} nodes the given hypotheses hold. Voices share their common history, so
+    #  * this is the number of nodes kept alive by the beam, rather than the sum of the voice lengths.
+    #  *
+    #  * @param states The {@link HmmVoiceSplittingModelState}s.
+    #  * @return The number of distinct Voice nodes reachable from the voices of the states.
+    #  */
+
+    @staticmethod
+    def getNumVoiceNodes(states):
+        seen = set()
+        for state in states:
+            for voice in state.getVoices():
+                node = voice
+                while node is not None and id(node) not in seen:
+                    seen.add(id(node))
+                    node = node.get_previous()
+        return len(seen)
+
+    # /**
+    #  * Get the peak resident set size of this process.
+    #  *
+    #  * @return The peak RSS so far, in bytes, or None if it cannot be read on this platform.
+    #  */
+
+    @staticmethod
+    def getPeakRss():
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _runCaseWorker(task):
+    params, useChannel, generator, numSongs, directory = task
+    return Benchmark(params, useChannel).runCase(generator, numSongs, directory)
+
+
+def argumentError(arg):
+    print("Benchmark: Argument error: ")
+    print(arg)
+    print("Usage: python benchmark.py ARGS")
+    print("-v INT[,INT...] = The numbers of voices to benchmark, one case each (default = 1,2,3,4)")
+    print("-c DOUBLE = The chord density: the probability that free voices attack together (default = " + str(
+        SyntheticMidiGenerator().chordDensity) + ")")
+    print("-x DOUBLE = The probability per eighth note of two adjacent voices swapping registers (default = " + str(
+        SyntheticMidiGenerator().crossingProbability) + ")")
+    print("-t INT = The number of tempo changes per file (default = 0)")
+    print("-l INT = The length of each file, in quarter notes (default = " + str(
+        SyntheticMidiGenerator().numBeats) + ")")
+    print("-n INT = The number of files per case (default = 2)")
+    print("-s INT = The random seed (default = 0)")
+    print("-b INT = Set the Beam Size parameter to the value INT (default = " + str(
+        HmmVoiceSplittingModelParameters.BEAM_SIZE_DEFAULT) + ")")
+    print("-i = Run each case in a fresh process, so that its peak RSS is measured alone")
+    print("-k DIR = Keep the generated files in the DIR directory")
+    print("-o FILE = Write the JSON results to FILE instead of stdout")
+    sys.exit(1)
+
+
+def main():
+    voiceCounts = [1, 2, 3, 4]
+    chordDensity = SyntheticMidiGenerator().chordDensity
+    crossingProbability = SyntheticMidiGenerator().crossingProbability
+    numTempoChanges = 0
+    numBeats = SyntheticMidiGenerator().numBeats
+    numSongs = 2
+    seed = 0
+    isolate = False
+    keepDir = None
+    outFile = None
+    params = HmmVoiceSplittingModelParameters()
+    params.set_defaults()
+
+    args = sys.argv
+    i = 1
+    while i < len(args):
+        if len(args[i]) != 2 or args[i][0] != '-':
+            argumentError(args[i])
+        flag = args[i][1]
+        if flag == 'i':
+            isolate = True
+            i += 1
+            continue
+        if i + 1 >= len(args):
+            argumentError(args[i] + " requires a value")
+        value = args[i + 1]
+        try:
+            if flag == 'v':
+                voiceCounts = [int(count) for count in value.split(',')]
+            elif flag == 'c':
+                chordDensity = float(value)
+            elif flag == 'x':
+                crossingProbability = float(value)
+            elif flag == 't':
+                numTempoChanges = int(value)
+            elif flag == 'l':
+                numBeats = int(value)
+            elif flag == 'n':
+                numSongs = int(value)
+            elif flag == 's':
+                seed = int(value)
+            elif flag == 'b':
+                params.BEAM_SIZE = int(value)
+            elif flag == 'k':
+                keepDir = value
+            elif flag == 'o':
+                outFile = value
+            else:
+                argumentError(args[i])
+        except ValueError:
+            argumentError(args[i] + " " + value)
+        i += 2
+
+    with tempfile.TemporaryDirectory() as tempDir:
+        directory = tempDir if keepDir is None else keepDir
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        tasks = []
+        for numVoices in voiceCounts:
+            try:
+                generator = SyntheticMidiGenerator(numVoices, chordDensity, crossingProbability, numTempoChanges,
+                                                   numBeats, seed)
+            except ValueError as e:
+                argumentError(str(e))
+            tasks.append((params, True, generator, numSongs, directory))
+
+        cases = []
+        for task in tasks:
+            if isolate:
+                with multiprocessing.get_context('spawn').Pool(1) as pool:
+                    cases.append(pool.apply(_runCaseWorker, (task,)))
+            else:
+                cases.append(_runCaseWorker(task))
+            print("%d voices: %.0f notes/s" % (cases[-1]['voices'], cases[-1]['notesPerSecond'] or 0),
+                  file=sys.stderr)
+
+    results = {'python': platform.python_version(), 'platform': platform.platform(),
+               'parameters': {'BEAM_SIZE': params.BEAM_SIZE,
+                              'NEW_VOICE_PROBABILITY': float(params.NEW_VOICE_PROBABILITY),
+                              'PITCH_HISTORY_LENGTH': params.PITCH_HISTORY_LENGTH,
+                              'GAP_STD_MICROS': float(params.GAP_STD_MICROS), 'PITCH_STD': float(params.PITCH_STD),
+                              'MIN_GAP_SCORE': float(params.MIN_GAP_SCORE), 'RECOMBINE': params.RECOMBINE,
+                              'MAX_ONSET_EXPANSIONS': params.MAX_ONSET_EXPANSIONS},
+               'isolated': isolate, 'cases': cases}
+    if outFile is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(outFile, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# /**
+#  * A <code>ComputeBudget</code> limits the amount of search an {@link HmmVoiceSplittingModel} performs,
+#  * per song and per incoming onset.
+#  * <p>
+#  * Each transition tried during state expansion spends one expansion. Expansion limits are
+#  * deterministic, so runs with the same limits give the same results. Time limits can be set as
+#  * well. The clock is only read every {@link #CHECK_INTERVAL} expansions, to keep it out of the hot loop.
+#  * A limit of 0 means unlimited.
+#  * <p>
+#  * Once the budget is exhausted, the search stops exploring and keeps its best-so-far beam.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import time
+
+
+class ComputeBudget:
+
+    CHECK_INTERVAL = 1024   # The number of expansions between two reads of the clock.
+
+    def __init__(self, maxOnsetExpansions=0, maxSongExpansions=0, maxOnsetSeconds=0, maxSongSeconds=0):
+        self.__maxOnsetExpansions = maxOnsetExpansions  # The maximum number of expansions per onset.
+        self.__maxSongExpansions = maxSongExpansions    # The maximum number of expansions per song.
+        self.__maxOnsetSeconds = maxOnsetSeconds        # The maximum number of seconds per onset.
+        self.__maxSongSeconds = maxSongSeconds          # The maximum number of seconds per song.
+        self.__onsetExpansions = 0                      # The number of expansions spent on this onset.
+        self.__songExpansions = 0                       # The number of expansions spent on this song.
+        self.__nextCheck = self.CHECK_INTERVAL          # The onset expansion count at which to read the clock next.
+        self.__songStart = None                         # The time at which the first onset started.
+        self.__onsetStart = None                        # The time at which this onset started.
+        self.__exhausted = False                        # True once any limit has been reached.
+
+    # /**
+    #  * Start a new onset. This resets the per-onset limits, but not the per-song ones.
+    #  */
+
+    def startOnset(self):
+        self.__onsetExpansions = 0
+        self.__nextCheck = self.CHECK_INTERVAL
+        if self.__maxOnsetSeconds or self.__maxSongSeconds:
+            self.__onsetStart = time.monotonic()
+            if self.__songStart is None:
+                self.__songStart = self.__onsetStart
+        self.__exhausted = self.__isSongExhausted()
+
+    # /**
+    #  * Spend a single expansion.
+    #  *
+    #  * @return True if the budget is not yet exhausted. False otherwise.
+    #  */
+
+    def spend(self):
+        self.__onsetExpansions += 1
+        self.__songExpansions += 1
+        if self.__maxOnsetExpansions and self.__onsetExpansions >= self.__maxOnsetExpansions:
+            self.__exhausted = True
+        elif self.__maxSongExpansions and self.__songExpansions >= self.__maxSongExpansions:
+            self.__exhausted = True
+        elif self.__onsetExpansions >= self.__nextCheck:
+            self.__nextCheck += self.CHECK_INTERVAL
+            self.__exhausted = self.__isOutOfTime()
+        return not self.__exhausted
+
+    def isExhausted(self):
+        return self.__exhausted
+
+    def getOnsetExpansions(self):
+        return self.__onsetExpansions
+
+    def getSongExpansions(self):
+        return self.__songExpansions
+
+    def __isSongExhausted(self):
+        if self.__maxSongExpansions and self.__songExpansions >= self.__maxSongExpansions:
+            return True
+        return bool(self.__maxSongSeconds) and time.monotonic() - self.__songStart >= self.__maxSongSeconds
+
+    def __isOutOfTime(self):
+        if not self.__maxOnsetSeconds and not self.__maxSongSeconds:
+            return False
+        now = time.monotonic()
+        if self.__maxOnsetSeconds and now - self.__onsetStart >= self.__maxOnsetSeconds:
+            return True
+        return bool(self.__maxSongSeconds) and now - self.__songStart >= self.__maxSongSeconds
@@ -0,0 +1,211 @@
+# /**
+#  * A <code>CorpusCache</code> stores parsed songs on disk, so that repeated runs over the same corpus
+#  * skip MIDI decoding entirely.
+#  * <p>
+#  * Each song is stored as a single uncompressed <code>.npz</code> file of columnar NumPy arrays: the
+#  * pitch, velocity, onset and offset ticks and times, and correct voice of every note, the gold standard
+#  * as (voice, note index) pairs, and the tempo map of its {@link TimeTracker}. Entries are keyed by a
+#  * hash of the MIDI file's content, {@link #PARSER_VERSION} and whether channels or tracks are used as
+#  * the correct voice. Bump {@link #PARSER_VERSION} whenever parsing changes.
+#  * <p>
+#  * {@link #encodeSong(NoteListGenerator, TimeTracker, list)} and {@link #decodeSong(dict)} are also the
+#  * compact form in which parsed songs can be passed between processes.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import hashlib
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from keysignature import KeySignature
+from midinote import MidiNote
+from notelistgenerator import NoteListGenerator
+from tempo import Tempo
+from timesignature import TimeSignature
+from timetracker import TimeTracker
+
+
+class CorpusCache:
+
+    PARSER_VERSION = 6  # The version of the parsing code. Entries of other versions are ignored.
+
+    def __init__(self, directory):
+        self.__directory = directory    # The directory holding the cache entries.
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    # /**
+    #  * Load the parsed song of the given MIDI file from this cache.
+    #  *
+    #  * @param midiFile The path of the MIDI file.
+    #  * @param useChannel True if channels are used as the correct voice, False for tracks.
+    #  * @return A (NoteListGenerator, TimeTracker, gold standard) tuple, or None if the song is not cached.
+    #  */
+
+    def load(self, midiFile, useChannel):
+        arrays = self.loadArrays(midiFile, useChannel)
+        if arrays is None:
+            return None
+        try:
+            return self.decodeSong(arrays)
+        except (ValueError, KeyError):
+            # A corrupt or incomplete entry is simply parsed again
+            return None
+
+    # /**
+    #  * Load the encoded song of the given MIDI file from this cache, without decoding it.
+    #  *
+    #  * @param midiFile The path of the MIDI file.
+    #  * @param useChannel True if channels are used as the correct voice, False for tracks.
+    #  * @return A dict of NumPy arrays, see {@link #decodeSong(dict)}, or None if the song is not cached.
+    #  */
+
+    def loadArrays(self, midiFile, useChannel):
+        path = self.__getEntryPath(midiFile, useChannel)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                return dict(arrays)
+        except (OSError, ValueError):
+            return None
+
+    # /**
+    #  * Store the given parsed song of the given MIDI file in this cache.
+    #  *
+    #  * @param midiFile The path of the MIDI file.
+    #  * @param useChannel True if channels are used as the correct voice, False for tracks.
+    #  * @param nlg The NoteListGenerator of the song.
+    #  * @param tt The TimeTracker of the song.
+    #  * @param goldStandard The gold standard voices of the song.
+    #  */
+
+    def store(self, midiFile, useChannel, nlg, tt, goldStandard):
+        self.storeArrays(midiFile, useChannel, self.encodeSong(nlg, tt, goldStandard))
+
+    def storeArrays(self, midiFile, useChannel, arrays):
+        path = self.__getEntryPath(midiFile, useChannel)
+        # Write to a temporary file first, so that an interrupted run never leaves a partial entry
+        temp = path + '.' + str(os.getpid()) + '.tmp'
+        with open(temp, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temp, path)
+
+    def __getEntryPath(self, midiFile, useChannel):
+        name = self.getContentHash(midiFile) + '-v' + str(self.PARSER_VERSION) + ('-c' if useChannel else '-t')
+        return os.path.join(self.__directory, name + '.npz')
+
+    # /**
+    #  * Get the hash of the content of the given file.
+    #  *
+    #  * @param path The path of the file.
+    #  * @return The hexadecimal SHA-1 digest of the file's bytes.
+    #  */
+
+    @staticmethod
+    def getContentHash(path):
+        digest = hashlib.sha1()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    # /**
+    #  * Encode a parsed song into columnar arrays.
+    #  *
+    #  * @param nlg The NoteListGenerator of the song.
+    #  * @param tt The TimeTracker of the song.
+    #  * @param goldStandard The gold standard voices of the song.
+    #  * @return A dict of NumPy arrays, see {@link #decodeSong(dict)}.
+    #  */
+
+    @staticmethod
+    def encodeSong(nlg, tt, goldStandard):
+        # The completed notes come first, in note list order. Notes which were never closed only
+        # appear in the gold standard, so they are appended after them.
+        notes = list(nlg.getNoteList())
+        numCompleted = len(notes)
+        noteIndices = {id(note): i for i, note in enumerate(notes)}
+        goldVoice = []
+        goldNote = []
+        for voice, goldNotes in enumerate(goldStandard):
+            for note in goldNotes:
+                if id(note) not in noteIndices:
+                    noteIndices[id(note)] = len(notes)
+                    notes.append(note)
+                goldVoice.append(voice)
+                goldNote.append(noteIndices[id(note)])
+
+        nodes = tt.getNodes()
+        return {
+            'pitch': np.array([note.getPitch() for note in notes], dtype=np.int16),
+            'velocity': np.array([note.getVelocity() for note in notes], dtype=np.int16),
+            'onsetTick': np.array([note.getOnsetTick() for note in notes], dtype=np.int64),
+            'offsetTick': np.array([note.getOffsetTick() for note in notes], dtype=np.int64),
+            'onsetTime': np.array([note.getOnsetTime() for note in notes], dtype=np.int64),
+            'offsetTime': np.array([note.getOffsetTime() for note in notes], dtype=np.int64),
+            'correctVoice': np.array([note.get_correct_voice() for note in notes], dtype=np.int32),
+            'numCompleted': np.array(numCompleted),
+            'goldVoice': np.array(goldVoice, dtype=np.int32),
+            'goldNote': np.array(goldNote, dtype=np.int64),
+            'numGoldVoices': np.array(len(goldStandard)),
+            'ppq': np.array(tt.getPPQ()),
+            'lastTick': np.array(tt.getLastTick()),
+            'nodeTick': np.array([node.getStartTick() for node in nodes], dtype=np.int64),
+            'nodeTempo': np.array([node.getTempo().getMicroSecondsPerQuarter() for node in nodes], dtype=np.int64),
+            'nodeNumerator': np.array([node.getTimeSignature().getNumerator() for node in nodes], dtype=np.int32),
+            'nodeDenominator': np.array([node.getTimeSignature().getDenominator() for node in nodes],
+                                        dtype=np.int32),
+            'nodeMetronome': np.array([node.getTimeSignature().getMetronomeTicksPerBeat() for node in nodes],
+                                      dtype=np.int32),
+            'nodeNotes32': np.array([node.getTimeSignature().getNotes32PerQuarter() for node in nodes],
+                                    dtype=np.int32),
+            'nodeKey': np.array([str(node.getKeySignature().get_key()) for node in nodes], dtype=str),
+            'nodeKeyTime': np.array([node.getKeySignature().get_time() for node in nodes], dtype=np.int64),
+        }
+
+    # /**
+    #  * Decode a parsed song from the arrays made by {@link #encodeSong(NoteListGenerator, TimeTracker, list)}.
+    #  *
+    #  * @param arrays A dict of NumPy arrays.
+    #  * @return A (NoteListGenerator, TimeTracker, gold standard) tuple.
+    #  */
+
+    @staticmethod
+    def decodeSong(arrays):
+        tt = TimeTracker()
+        tt.setPPQ(int(arrays['ppq']))
+        tt.setLastTick(int(arrays['lastTick']))
+        for i in range(len(arrays['nodeTick'])):
+            tempo = Tempo()
+            tempo.set_fields(SimpleNamespace(tempo=int(arrays['nodeTempo'][i]), time=0))
+            timeSignature = TimeSignature()
+            timeSignature.set_fields(SimpleNamespace(numerator=int(arrays['nodeNumerator'][i]),
+                                                     denominator=int(arrays['nodeDenominator'][i]),
+                                                     time=int(arrays['nodeMetronome'][i]),
+                                                     notated_32nd_notes_per_beat=int(arrays['nodeNotes32'][i])))
+            keySignature = KeySignature()
+            keySignature.set_fields(SimpleNamespace(key=str(arrays['nodeKey'][i]),
+                                                    time=int(arrays['nodeKeyTime'][i])))
+            # The first node starts at tick 0, so it is updated in place rather than added
+            tt.addNode(int(arrays['nodeTick'][i]), tempo, timeSignature, keySignature)
+
+        nlg = NoteListGenerator(tt)
+        table = nlg.getNoteTable()
+        columns = {name: arrays[name] for name in ('pitch', 'velocity', 'onsetTime', 'onsetTick', 'offsetTime',
+                                                   'offsetTick', 'correctVoice')}
+        columns['guessedVoice'] = np.full(len(arrays['pitch']), -1)
+        start = table.addRows(columns)
+        notes = MidiNote.getViews(table, start, start + len(arrays['pitch']))
+        for note in notes[:int(arrays['numCompleted'])]:
+            nlg.addCompletedNote(note)
+
+        goldStandard = [[] for _ in range(int(arrays['numGoldVoices']))]
+        for voice, noteIndex in zip(arrays['goldVoice'].tolist(), arrays['goldNote'].tolist()):
+            goldStandard[voice].append(notes[noteIndex])
+        return nlg, tt, goldStandard
@@ -1,12 +1,23 @@
+import heapq
 import math
 
-from mido import MidiFile, MetaMessage
+from mido import MidiFile
+
+from smfreader import SmfReader
 
 
 class EventParser:
 
-    def __init__(self, midiFile, noteEventParser, timeTracker, useChannel):
-        self.song = MidiFile(midiFile)
+    # The file is read with an SmfReader, or with mido if useMido is True or the SmfReader cannot read it
+    def __init__(self, midiFile, noteEventParser, timeTracker, useChannel, useMido=False):
+        self.song = None
+        if not useMido:
+            try:
+                self.song = SmfReader(midiFile)
+            except (ValueError, IndexError, OSError):
+                self.song = None
+        if self.song is None:
+            self.song = MidiFile(midiFile)
         self.noteEventParser = noteEventParser
         self.timeTracker = timeTracker
         self.timeTracker.setPPQ(self.song.ticks_per_beat)
@@ -16,44 +27,62 @@ class EventParser:
 
     def run(self):
         lastTick = 0
-        calculate_tick = 0
-        for trackNum in range(len(self.song.tracks)):
-            note_on_tick = 0
-            note_off_tick = 0
-            track = self.song.tracks[trackNum]
-            lastTick = max(calculate_tick, lastTick)
-            for i in range(len(track)):
-                event = track[i]
-                if isinstance(event, MetaMessage):
-                    calculate_tick = 0
+        try:
+            for tick, isNote, trackNum, index, event in self.getEvents():
+                lastTick = max(lastTick, tick)
+                if not isNote:
                     if event.type == 'set_tempo':
-                        self.timeTracker.addTempoChange(event, 0)
+                        self.timeTracker.addTempoChange(event, tick)
                     elif event.type == 'time_signature':
-                        self.timeTracker.addTimeSignatureChange(event, 0)
+                        self.timeTracker.addTimeSignatureChange(event, tick)
                     elif event.type == 'key_signature':
-                        self.timeTracker.addKeySignatureChange(event, 0)
-                elif event.type == 'note_on':
-                    key = event.note
-                    velocity = event.velocity
-                    channel = event.bytes()[0] & 0x0f
-                    correctVoice = channel if self.useChannel else trackNum
-                    note_on_tick = note_off_tick
-                    if velocity!=0:
-                        note = self.noteEventParser.noteOn(key, velocity, note_on_tick, correctVoice)
-                        while len(self.goldStandard) <= correctVoice:
-                            self.goldStandard.append(list())
-                        self.goldStandard.__getitem__(correctVoice).append(note)
-                    calculate_tick = calculate_tick + int(event.time)
-                elif event.type == 'note_off':
-                    if event.time != 0:
-                        note_off_tick = note_off_tick + event.time
-                    else:
-                        note_off_tick = note_off_tick + self.song.ticks_per_beat
-                    self.noteEventParser.noteOff(event.note, note_off_tick, correctVoice)
-                    calculate_tick = calculate_tick + int(event.time)
+                        self.timeTracker.addKeySignatureChange(event, tick)
+                    continue
+
+                correctVoice = event.channel if self.useChannel else trackNum
+                if event.type == 'note_on' and event.velocity != 0:
+                    note = self.noteEventParser.noteOn(event.note, event.velocity, tick, correctVoice)
+                    while len(self.goldStandard) <= correctVoice:
+                        self.goldStandard.append(list())
+                    self.goldStandard[correctVoice].append(note)
                 else:
-                    calculate_tick = calculate_tick + int(event.time)
+                    # A note on with velocity 0 is a note off
+                    self.noteEventParser.noteOff(event.note, tick, correctVoice)
+        finally:
+            if isinstance(self.song, SmfReader):
+                self.song.close()
+
+        table = self.noteEventParser.getNoteTable()
+        for voiceIndex, goldVoice in enumerate(self.goldStandard):
+            if table is None:
+                goldVoice.sort()
+            else:
+                self.goldStandard[voiceIndex] = table.sortNotes(goldVoice)
+        self.timeTracker.setLastTick(lastTick)
+        self.noteEventParser.finish()
+
+    # /**
+    #  * Get the events of every track, merged into a single stream in time order. Each track is read
+    #  * lazily, so only one pending event per track is buffered.
+    #  * <p>
+    #  * Events at the same tick come tempo, time and key signature changes first, so that notes at that
+    #  * tick are timed with them, and then in track order. Within a track, the file order is kept.
+    #  *
+    #  * @return A generator of (absolute tick, True for notes and False for meta events, track number,
+    #  * index within the track, event) tuples. Other events are skipped.
+    #  */
+
+    def getEvents(self):
+        return heapq.merge(*(self.__getTrackEvents(trackNum, track)
+                             for trackNum, track in enumerate(self.song.tracks)))
 
-        for gS in range(len(self.goldStandard)):
-            self.goldStandard.sort()
-        self.timeTracker.setLastTick(lastTick)
\ No newline at end of file
+    @staticmethod
+    def __getTrackEvents(trackNum, track):
+        tick = 0
+        for index, event in enumerate(track):
+            tick += event.time
+            if event.is_meta:
+                if event.type in ('set_tempo', 'time_signature', 'key_signature', 'end_of_track'):
+                    yield tick, False, trackNum, index, event
+            elif event.type == 'note_on' or event.type == 'note_off':
+                yield tick, True, trackNum, index, event
\ No newline at end of file
@@ -0,0 +1,59 @@
+# /**
+#  * A <code>GoldStandard</code> holds the correct voices of a song, indexed for scoring.
+#  * <p>
+#  * Every pair of consecutive notes in a correct voice is a link. The links are kept in a set, and the
+#  * voice of each note in a dict, so that a guessed link or note is checked in constant time rather than by
+#  * searching the voice lists.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+
+class GoldStandard:
+
+    # /**
+    #  * Create a new GoldStandard from the given correct voices.
+    #  *
+    #  * @param voices A List with, for each correct voice, the List of its notes in order.
+    #  */
+
+    def __init__(self, voices):
+        self.__voices = voices      # The correct voices, each a List of notes in order.
+        self.__links = set()        # (previous note, note) for every link of the correct voices.
+        self.__noteVoices = {}      # Note -> the index of its correct voice.
+        self.__numLinks = 0         # The number of links, that is len(links).
+        for voiceIndex, notes in enumerate(voices):
+            for i, note in enumerate(notes):
+                self.__noteVoices[note] = voiceIndex
+                if i > 0:
+                    self.__links.add((notes[i - 1], note))
+        self.__numLinks = len(self.__links)
+
+    # /**
+    #  * Decide whether the given notes are consecutive in a correct voice.
+    #  *
+    #  * @param prev The earlier note.
+    #  * @param note The later note.
+    #  * @return True if prev is directly followed by note in its correct voice. False otherwise.
+    #  */
+
+    def isLink(self, prev, note):
+        return (prev, note) in self.__links
+
+    # /**
+    #  * Get the correct voice of the given note.
+    #  *
+    #  * @param note The note.
+    #  * @return The index of the note's correct voice, or -1 if it is in none.
+    #  */
+
+    def getVoice(self, note):
+        return self.__noteVoices.get(note, -1)
+
+    def getNumLinks(self):
+        return self.__numLinks
+
+    def getVoices(self):
+        return self.__voices
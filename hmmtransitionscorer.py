@@ -0,0 +1,129 @@
+# /**
+#  * An <code>HmmTransitionScorer</code> computes, in one batched NumPy pass, the log probability of every
+#  * (note, voice) transition for a single incoming onset of an {@link HmmVoiceSplittingModelState}.
+#  * <p>
+#  * Two matrices are built against the voice frontier as it was before the onset: one for adding each
+#  * note to each existing voice, and one for starting a new voice in each of the gaps between them
+#  * (including both ends). Both already include the pitch-order penalties against the neighbouring voices.
+#  * The candidate enumeration then only looks values up. The penalties are re-derived (without any logs)
+#  * only when a neighbour has changed earlier in the same onset, because it received a note or a new
+#  * voice was inserted next to it.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import math
+
+import numpy as np
+
+
+class HmmTransitionScorer:
+
+    LOG_2 = math.log(2)     # The penalty for each neighbouring voice that is on the wrong side of a note.
+
+    def __init__(self, notes, voices, params):
+        self.__frontier = list(voices)   # The voices as they were before this onset.
+        self.__columns = {}              # id(Voice) -> its column in the matrices below.
+        self.__pitches = [note.getPitch() for note in notes]
+        self.__emission = []             # [note][voice] log probability, without pitch-order penalties.
+        self.__existing = []             # [note][voice] log probability of adding the note to the voice.
+        self.__newVoice = []             # [note][slot] log probability of a new voice at the slot.
+        self.__newVoiceLogProb = math.log(params.NEW_VOICE_PROBABILITY)
+
+        for column, voice in enumerate(self.__frontier):
+            self.__columns[id(voice)] = column
+
+        self.__score(notes, params)
+
+    def __score(self, notes, params):
+        numVoices = len(self.__frontier)
+        pitches = np.array(self.__pitches, dtype=float)
+
+        # Penalties against the original neighbours
+        lastPitches = np.array([voice.get_most_recent_note().getPitch() for voice in self.__frontier], dtype=float)
+        below = pitches[:, None] < lastPitches[None, :]
+        above = pitches[:, None] > lastPitches[None, :]
+
+        # New voices: slot s lies between voice s - 1 and voice s
+        newVoice = np.full((len(notes), numVoices + 1), self.__newVoiceLogProb)
+        newVoice[:, 1:] -= self.LOG_2 * below
+        newVoice[:, :-1] -= self.LOG_2 * above
+        self.__newVoice = newVoice.tolist()
+
+        if numVoices == 0:
+            self.__emission = [[] for _ in notes]
+            self.__existing = [[] for _ in notes]
+            return
+
+        # Existing voices: see Voice#getProbability
+        weightedPitches = np.array([voice.getWeightedLastPitch(params) for voice in self.__frontier])
+        offsetTimes = np.array([voice.get_most_recent_note().getOffsetTime() for voice in self.__frontier],
+                               dtype=float)
+        onsetTimes = np.array([note.getOnsetTime() for note in notes], dtype=float)
+
+        fraction = (pitches[:, None] - weightedPitches[None, :]) / float(params.PITCH_STD)
+        logPitch = -(fraction * fraction) / 2.0
+
+        timeDiff = np.abs(offsetTimes[None, :] - onsetTimes[:, None])
+        inside = np.maximum(0, timeDiff / float(params.GAP_STD_MICROS) + 1)
+        gap = np.maximum(np.log(inside) + 1, float(params.MIN_GAP_SCORE))
+
+        emission = logPitch + np.log(gap)
+        self.__emission = emission.tolist()
+
+        existing = emission.copy()
+        existing[:, 1:] -= self.LOG_2 * below[:, :-1]
+        existing[:, :-1] -= self.LOG_2 * above[:, 1:]
+        self.__existing = existing.tolist()
+
+    # /**
+    #  * Get the log probability of adding the given note to the voice at the given index of newVoices.
+    #  *
+    #  * @param noteIndex The index of the note within the onset.
+    #  * @param transition The index of the voice in newVoices. It must be one of the voices of the frontier.
+    #  * @param newVoices The current voices, including any changes made earlier in this onset.
+    #  * @return The log probability of the transition.
+    #  */
+
+    def getExistingProb(self, noteIndex, transition, newVoices):
+        column = self.__columns[id(newVoices[transition])]
+        prev = None if transition == 0 else newVoices[transition - 1]
+        next = None if transition == len(newVoices) - 1 else newVoices[transition + 1]
+        if self.__isFrontierSlot(prev, next, column - 1, column + 1):
+            return self.__existing[noteIndex][column]
+        return self.__emission[noteIndex][column] - self.__penalty(self.__pitches[noteIndex], prev, next)
+
+    # /**
+    #  * Get the log probability of adding the given note to a new voice inserted at the given index of newVoices.
+    #  *
+    #  * @param noteIndex The index of the note within the onset.
+    #  * @param slot The index at which the new voice would be inserted.
+    #  * @param newVoices The current voices, including any changes made earlier in this onset.
+    #  * @return The log probability of the transition.
+    #  */
+
+    def getNewVoiceProb(self, noteIndex, slot, newVoices):
+        prev = None if slot == 0 else newVoices[slot - 1]
+        next = None if slot == len(newVoices) else newVoices[slot]
+        if next is None:
+            column = len(self.__frontier)
+        else:
+            column = self.__columns.get(id(next), -1)
+        if column != -1 and self.__isFrontierSlot(prev, next, column - 1, column):
+            return self.__newVoice[noteIndex][column]
+        return self.__newVoiceLogProb - self.__penalty(self.__pitches[noteIndex], prev, next)
+
+    def __isFrontierSlot(self, prev, next, prevColumn, nextColumn):
+        expectedPrev = self.__frontier[prevColumn] if prevColumn >= 0 else None
+        expectedNext = self.__frontier[nextColumn] if nextColumn < len(self.__frontier) else None
+        return prev is expectedPrev and next is expectedNext
+
+    def __penalty(self, pitch, prev, next):
+        penalty = 0
+        if prev is not None and pitch < prev.getMostRecentPitch():
+            penalty += self.LOG_2
+        if next is not None and pitch > next.getMostRecentPitch():
+            penalty += self.LOG_2
+        return penalty
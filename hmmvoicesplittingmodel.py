@@ -1,34 +1,103 @@
-import bisect
-
+from beam import Beam
+from computebudget import ComputeBudget
 from voicesplittingmodel import VoiceSplittingModel
 from hmmvoicesplittingmodelstate import HmmVoiceSplittingModelState
-import time
 
 
 
 class HmmVoiceSplittingModel(VoiceSplittingModel):
 
-    def __init__(self, params):
+    # /**
+    #  * Create a new model with the given parameters.
+    #  *
+    #  * @param params The parameters to use.
+    #  * @param goldStandard If given, the {@link GoldStandard} of the song. Each hypothesis then counts its
+    #  * correct and incorrect links as notes are added, see {@link HmmVoiceSplittingModelState#getTruePositives()}.
+    #  */
+
+    def __init__(self, params, goldStandard=None):
         self.__hypothesisStates = None
         self.__params = None
+        self.__prunedRoots = {}     # id(Voice) -> Voice, for the first Voice of each chain left by the last pruning.
         self.__params = params
+        self.__budget = ComputeBudget(params.MAX_ONSET_EXPANSIONS, params.MAX_SONG_EXPANSIONS,
+                                      params.MAX_ONSET_SECONDS, params.MAX_SONG_SECONDS)
         self.__hypothesisStates = []
         state = HmmVoiceSplittingModelState()
         state.set_fields(0,[],params)
-        bisect.insort(self.__hypothesisStates,state)
+        state.setGoldStandard(goldStandard)
+        self.__hypothesisStates.append(state)
 
     def get_hypotheses(self):
         return self.__hypothesisStates
 
+    # /**
+    #  * Replace the current hypotheses, for instance to drop those which disagree with voice assignments
+    #  * which have already been committed.
+    #  *
+    #  * @param states The new hypothesis states, best first.
+    #  */
+
+    def set_hypotheses(self, states):
+        self.__hypothesisStates = states
+
     def handle_incoming(self, notes):
-        if len(self.__hypothesisStates)>10:
-            return
-        newStates = []
+        # Every state expands into the same beam, so only the best BEAM_SIZE candidates are ever built
+        beam = Beam(self.__params.BEAM_SIZE, self.__params.RECOMBINE)
+        self.__budget.startOnset()
         for state in self.__hypothesisStates:
-            returned_notes = state.handle_incoming(notes)
-            for temp in returned_notes:
-                bisect.insort(newStates, temp)
-        self.__hypothesisStates = newStates
+            if self.__budget.isExhausted() and not beam.isEmpty():
+                break
+            state.handle_incoming(notes, beam, self.__budget)
+        self.__hypothesisStates = beam.getStates()
+
+    # /**
+    #  * Prune the prefix of voice history which all hypotheses share.
+    #  * <p>
+    #  * {@link Voice} nodes are shared between hypotheses, so a node reachable from every hypothesis, and all
+    #  * of its ancestors, can no longer change. In each chain, the newest such node is detached from its
+    #  * {@link Voice#previous} Voice, so memory is bounded by the window of undecided notes rather than by
+    #  * the length of the piece.
+    #  *
+    #  * @return A List of (note, the note before it in its voice or None) for each newly pruned note, in
+    #  * onset order.
+    #  */
+
+    def pruneCommonPrefix(self):
+        counts = {}
+        for state in self.__hypothesisStates:
+            for voice in state.getVoices():
+                node = voice
+                while node is not None:
+                    counts[id(node)] = counts.get(id(node), 0) + 1
+                    node = node.get_previous()
+
+        # Voices never share nodes within a state, so a node is shared by all if it is counted once each
+        numStates = len(self.__hypothesisStates)
+        roots = {}
+        for state in self.__hypothesisStates:
+            for voice in state.getVoices():
+                node = voice
+                while node is not None and counts[id(node)] < numStates:
+                    node = node.get_previous()
+                if node is not None:
+                    roots[id(node)] = node
+
+        pruned = []
+        for root in roots.values():
+            node = root
+            while node is not None and id(node) not in self.__prunedRoots:
+                prev = node.get_previous()
+                pruned.append((node.get_most_recent_note(), None if prev is None else prev.get_most_recent_note()))
+                node = prev
+            root.detachPrevious()
+        self.__prunedRoots = roots
+
+        pruned.sort(key=lambda pair: pair[0].getOnsetTime())
+        return pruned
+
+    def get_budget(self):
+        return self.__budget
 
     def getF1(self, goldStandard):
         if self.__hypothesisStates is None or len(self.__hypothesisStates)==0:
@@ -36,15 +105,11 @@ class HmmVoiceSplittingModel(VoiceSplittingModel):
 
         voices = self.__hypothesisStates[0].getVoices()
 
-        totalPositives = 0
+        totalPositives = goldStandard.getNumLinks()
         truePositives = 0
         falsePositives = 0
         falseNegatives = 0
 
-        for goldVoice in goldStandard:
-            if len(goldVoice) != 0:
-                totalPositives += len(goldVoice) - 1
-
         for voice in voices:
             voiceTruePositives = voice.getNumLinksCorrect(goldStandard)
             voiceFalsePositives = voice.get_num_notes() - 1 - voiceTruePositives
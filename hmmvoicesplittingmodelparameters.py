@@ -7,7 +7,11 @@ class HmmVoiceSplittingModelParameters:
         self.PITCH_HISTORY_LENGTH = 0
         self.NEW_VOICE_PROBABILITY = 0
         self.BEAM_SIZE = 0
-
+        self.RECOMBINE = self.RECOMBINE_DEFAULT
+        self.MAX_ONSET_EXPANSIONS = self.MAX_ONSET_EXPANSIONS_DEFAULT
+        self.MAX_SONG_EXPANSIONS = self.MAX_SONG_EXPANSIONS_DEFAULT
+        self.MAX_ONSET_SECONDS = self.MAX_ONSET_SECONDS_DEFAULT
+        self.MAX_SONG_SECONDS = self.MAX_SONG_SECONDS_DEFAULT
 
     MIN_GAP_SCORE_DEFAULT = 8E-4
     PITCH_STD_DEFAULT = 4
@@ -15,6 +19,13 @@ class HmmVoiceSplittingModelParameters:
     PITCH_HISTORY_LENGTH_DEFAULT = 6
     NEW_VOICE_PROBABILITY_DEFAULT = 1E-9
     BEAM_SIZE_DEFAULT = 25
+    RECOMBINE_DEFAULT = True
+
+    # Compute budget (see ComputeBudget). A value of 0 means unlimited.
+    MAX_ONSET_EXPANSIONS_DEFAULT = 200000
+    MAX_SONG_EXPANSIONS_DEFAULT = 0
+    MAX_ONSET_SECONDS_DEFAULT = 0
+    MAX_SONG_SECONDS_DEFAULT = 0
 
     def __init__(self):
         self._initialize_instance_fields()
@@ -29,6 +40,12 @@ class HmmVoiceSplittingModelParameters:
         self.PITCH_STD = PS
         self.MIN_GAP_SCORE = MGS
 
+    def set_budget(self, maxOnsetExpansions, maxSongExpansions, maxOnsetSeconds, maxSongSeconds):
+        self.MAX_ONSET_EXPANSIONS = maxOnsetExpansions
+        self.MAX_SONG_EXPANSIONS = maxSongExpansions
+        self.MAX_ONSET_SECONDS = maxOnsetSeconds
+        self.MAX_SONG_SECONDS = maxSongSeconds
+
     def set_defaults(self):
         self.BEAM_SIZE = self.BEAM_SIZE_DEFAULT
         self.NEW_VOICE_PROBABILITY = self.NEW_VOICE_PROBABILITY_DEFAULT
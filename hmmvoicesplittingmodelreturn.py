@@ -7,6 +7,10 @@ class HmmVoiceSplittingModelTesterReturn:
         self.__voiceConsistency = 0
         self.__precision = 0
         self.__recall = 0
+        self.__numSongs = None      # The number of songs the scores are averaged over, if not the whole corpus.
+        self.__abandoned = False    # True if evaluation was stopped early, see RacingEvaluator.
+        self.__seconds = 0          # The total inference time of the songs, in seconds.
+        self.__songScores = None    # The (voice consistency, precision, recall) of each song, if known.
 
     def __init__(self):
         self._initialize_instance_fields()
@@ -40,6 +44,34 @@ class HmmVoiceSplittingModelTesterReturn:
             return -float('inf') if self.__precision == -float('inf') else 2 * self.__precision * self.__recall / (self.__precision + self.__recall)
         return -float('inf')
 
+    def getNumSongs(self):
+        return self.__numSongs
+
+    def getSeconds(self):
+        return self.__seconds
+
+    def setSeconds(self, seconds):
+        self.__seconds = seconds
+
+    def getSongScores(self):
+        return self.__songScores
+
+    def setSongScores(self, songScores):
+        self.__songScores = songScores
+
+    def isAbandoned(self):
+        return self.__abandoned
+
+    # /**
+    #  * Mark these scores as those of a parameter set whose evaluation was stopped early.
+    #  *
+    #  * @param numSongs The number of songs evaluated before stopping.
+    #  */
+
+    def setAbandoned(self, numSongs):
+        self.__abandoned = True
+        self.__numSongs = numSongs
+
     def setParams(self, params):
         self.__parameters = params
 
@@ -53,4 +85,7 @@ class HmmVoiceSplittingModelTesterReturn:
         self.__recall = rec
 
     def __str__(self):
-        return str(self.__parameters) + " = V=" + str(self.__voiceConsistency) + " P=" + str(self.__precision) + " R=" + str(self.__recall) + " F1=" + str(str(self.getF1()))
+        string = str(self.__parameters) + " = V=" + str(self.__voiceConsistency) + " P=" + str(self.__precision) + " R=" + str(self.__recall) + " F1=" + str(str(self.getF1()))
+        if self.__abandoned:
+            string += " (abandoned after " + str(self.__numSongs) + " songs)"
+        return string
@@ -0,0 +1,98 @@
+# /**
+#  * An <code>HmmVoiceSplittingModelSongReturn</code> is the compact result of running an
+#  * {@link HmmVoiceSplittingModel} on a single song.
+#  * <p>
+#  * Rather than the {@link Voice} graph of the best hypothesis, it holds the counts needed to score it and, if
+#  * the voices are needed, the voice index assigned to each note of the song's note list. It is small and cheap
+#  * to send back from a worker process. The voices can be rebuilt from the note list with {@link #getVoices(list)}.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import numpy as np
+
+
+class HmmVoiceSplittingModelSongReturn:
+
+    def _initialize_instance_fields(self):
+        self.__voiceAssignment = None   # The guessed voice index of each note of the note list (or -1), if kept.
+        self.__numVoices = 0            # The number of voices in the best hypothesis.
+        self.__truePositives = 0        # The number of correct links.
+        self.__falsePositives = 0       # The number of incorrect links.
+        self.__noteCount = 0            # The number of notes scored.
+        self.__voiceAccSum = 0          # The sum of the voice consistency of each scored voice.
+        self.__voiceStats = []          # (notes correct, notes) for each scored voice.
+        self.__seconds = 0              # The time inference took, in seconds.
+
+    def __init__(self):
+        self._initialize_instance_fields()
+
+    def set_fields(self, voiceAssignment, numVoices, truePositives, falsePositives, noteCount, voiceAccSum,
+                   voiceStats):
+        self.__voiceAssignment = voiceAssignment
+        self.__numVoices = numVoices
+        self.__truePositives = truePositives
+        self.__falsePositives = falsePositives
+        self.__noteCount = noteCount
+        self.__voiceAccSum = voiceAccSum
+        self.__voiceStats = voiceStats
+
+    # /**
+    #  * Get the voice index assigned to each note of the given voices.
+    #  *
+    #  * @param voices The voices of the best hypothesis.
+    #  * @param noteList The note list of the song, see {@link NoteListGenerator#getNoteList()}.
+    #  * @return An array holding, for each note of noteList, the index of its voice, or -1.
+    #  */
+
+    @staticmethod
+    def computeVoiceAssignment(voices, noteList):
+        noteIndices = {id(note): i for i, note in enumerate(noteList)}
+        assignment = np.full(len(noteList), -1, dtype=np.int32)
+        for voiceIndex, voice in enumerate(voices):
+            for note in voice.get_notes():
+                assignment[noteIndices[id(note)]] = voiceIndex
+        return assignment
+
+    # /**
+    #  * Rebuild the guessed voices from the given note list.
+    #  *
+    #  * @param noteList The note list of the song, see {@link NoteListGenerator#getNoteList()}.
+    #  * @return A List with, for each voice, the List of its notes in order. The voices must have been kept,
+    #  *         see {@link HmmVoiceSplittingModelTester#evaluateSong(HmmVoiceSplittingModelParameters, int, bool)}.
+    #  */
+
+    def getVoices(self, noteList):
+        voices = [[] for _ in range(self.__numVoices)]
+        for noteIndex in np.flatnonzero(self.__voiceAssignment >= 0):
+            voices[self.__voiceAssignment[noteIndex]].append(noteList[noteIndex])
+        return voices
+
+    def getVoiceAssignment(self):
+        return self.__voiceAssignment
+
+    def getNumVoices(self):
+        return self.__numVoices
+
+    def getTruePositives(self):
+        return self.__truePositives
+
+    def getFalsePositives(self):
+        return self.__falsePositives
+
+    def getNoteCount(self):
+        return self.__noteCount
+
+    def getVoiceAccSum(self):
+        return self.__voiceAccSum
+
+    def getVoiceStats(self):
+        return self.__voiceStats
+
+    def getSeconds(self):
+        return self.__seconds
+
+    def setSeconds(self, seconds):
+        self.__seconds = seconds
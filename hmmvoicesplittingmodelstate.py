@@ -1,11 +1,11 @@
-import sys
 import bisect
 
+from beam import Beam
+from computebudget import ComputeBudget
 from mathutils import MathUtils
 from voicesplittingmodelstate import VoiceSplittingModelState
 from voice import Voice
-import time
-import math
+from hmmtransitionscorer import HmmTransitionScorer
 
 
 class HmmVoiceSplittingModelState(VoiceSplittingModelState):
@@ -14,7 +14,14 @@ class HmmVoiceSplittingModelState(VoiceSplittingModelState):
         self.__voices = None
         self.__logProb = 0
         self.__params = None
-        self.start_time = time.time()
+        self.__scorer = None    # The HmmTransitionScorer of the onset currently being handled.
+        self.__beam = None      # The Beam the candidates of the onset currently being handled are added to.
+        self.__budget = None    # The ComputeBudget the expansion of the onset currently being handled spends.
+        self.__linkCounts = None    # [true positives, false positives] of the candidate currently being built.
+        self.__signature = None # The cached value of {@link #getFrontierSignature()}.
+        self.__goldStandard = None  # The GoldStandard to count correct links against, or None.
+        self.__truePositives = 0    # The number of links in this state's voices which are in the gold standard.
+        self.__falsePositives = 0   # The number of links in this state's voices which are not.
 
     def __init__(self):
         self._initialize_instance_fields()
@@ -25,219 +32,254 @@ class HmmVoiceSplittingModelState(VoiceSplittingModelState):
         self.__logProb = logProb
         self.__params = params
 
-    def handle_incoming(self, notes):
+    # /**
+    #  * Set the gold standard to count correct links against. The states expanded from this one inherit it,
+    #  * and keep their link counts up to date as each note is added.
+    #  *
+    #  * @param goldStandard The {@link GoldStandard} of the song.
+    #  */
+
+    def setGoldStandard(self, goldStandard):
+        self.__goldStandard = goldStandard
+
+    # /**
+    #  * Get the candidate states which result from adding the given notes to this state.
+    #  *
+    #  * @param notes The notes of the incoming onset.
+    #  * @param beam The Beam to add the candidates to, which may be shared with other states.
+    #  * If None, a new Beam of {@link HmmVoiceSplittingModelParameters#BEAM_SIZE} is used.
+    #  * @param budget The ComputeBudget to spend, which may be shared with other states. Once it is
+    #  * exhausted, the expansion stops as soon as the beam holds at least one state. If None, a new
+    #  * per-onset budget is taken from the parameters.
+    #  * @return A List of the states in the beam, best first.
+    #  */
+
+    def handle_incoming(self, notes, beam=None, budget=None):
+        self.__beam = Beam(self.__params.BEAM_SIZE, self.__params.RECOMBINE) if beam is None else beam
+        if budget is None:
+            budget = ComputeBudget(self.__params.MAX_ONSET_EXPANSIONS, 0, self.__params.MAX_ONSET_SECONDS, 0)
+            budget.startOnset()
+        self.__budget = budget
         indices = self.__getOpenVoiceIndices(notes, self.__voices)
-        return self.__getAllCandidateNewStatesRecursive(indices, notes,
-                                                        self.__voices, self.__logProb, 0)
-
-    def __getAllCandidateNewStatesRecursive(self, openVoiceIndices, incoming, newVoices, logProbSum, noteIndex):
-        self.curr_time = time.time()
-        if noteIndex == len(incoming) or round(self.curr_time - self.start_time) > 20:
-            newStates = []
-            state = HmmVoiceSplittingModelState()
-            new_vcs = []
-            for t in newVoices:
-                new_vcs.append(t)
-            state.set_fields(logProbSum, new_vcs, self.__params)
-            bisect.insort(newStates, state)
-            return newStates
-        newStates = []
-        self.curr_time = time.time()
-        if round(self.curr_time - self.start_time) == 20:
-            return
-        if len(self.__voices) < 0x7fffffff:
-            newVoiceProbs = [0 for _ in range(len(newVoices) + 1)]
-            i = 0
-            while i < len(newVoiceProbs):
-                newVoiceProbs[i] = self.__getTransitionProb(incoming[noteIndex], -i - 1, newVoices)
-                i += 1
+        self.__scorer = HmmTransitionScorer(notes, self.__voices, self.__params)
+        self.__linkCounts = [self.__truePositives, self.__falsePositives]
+        self.__enumerateCandidates(indices, notes, list(self.__voices), self.__logProb)
+        beam = self.__beam
+        self.__scorer = None
+        self.__beam = None
+        self.__budget = None
+        self.__linkCounts = None
+        return beam.getStates()
+
+    # /**
+    #  * Enumerate every candidate assignment of the incoming notes to voices, depth first, and add the
+    #  * resulting states to {@link #beam}.
+    #  * <p>
+    #  * This uses an explicit stack rather than recursing once per note. Each transition is pushed as
+    #  * three entries: DO applies it to newVoices and openVoiceIndices, VISIT expands the next note on top
+    #  * of it, and UNDO reverses it once everything above it has been popped. The children of a note are
+    #  * pushed in reverse, so they are tried in the same order as before: new voices first (only in the
+    #  * slots with the maximum probability), then each open existing voice.
+    #  *
+    #  * @param openVoiceIndices For each note, the indices of the voices it may be added to.
+    #  * @param incoming The notes of the incoming onset.
+    #  * @param newVoices The voices to add the notes to. This List is modified in place.
+    #  * @param logProbSum The log probability of this state.
+    #  */
+
+    def __enumerateCandidates(self, openVoiceIndices, incoming, newVoices, logProbSum):
+        stack = [(self.__VISIT, 0, logProbSum, None)]
+        while stack:
+            action, noteIndex, logProbSum, transition = stack.pop()
+
+            if action == self.__DO:
+                if self.__isStopped():
+                    # The changes on the stack need not be reversed: newVoices and openVoiceIndices
+                    # are private to this expansion.
+                    return
+                transition[2] = self.__doTransition(incoming[noteIndex], transition[0], newVoices)
+                transition[1] = self.__fixOpenVoiceIndices(openVoiceIndices, noteIndex, transition[0])
+
+            elif action == self.__UNDO:
+                self.__reverseTransition(transition[0], newVoices, transition[2])
+                self.__reverseOpenVoiceIndices(openVoiceIndices, noteIndex, transition[0], transition[1])
+
+            elif noteIndex == len(incoming):
+                # Only build states which will make it into the beam
+                if self.__beam.accepts(logProbSum, len(newVoices)):
+                    state = HmmVoiceSplittingModelState()
+                    state.set_fields(logProbSum, list(newVoices), self.__params)
+                    state.__goldStandard = self.__goldStandard
+                    state.__truePositives, state.__falsePositives = self.__linkCounts
+                    self.__beam.add(state)
 
-            maxIndex = MathUtils.getMaxIndex(newVoiceProbs)
+            else:
+                for transition, logProb in reversed(self.__getChildren(openVoiceIndices, noteIndex, newVoices)):
+                    # transition is [transition value, openVoiceIndices changes, link count changed],
+                    # filled in by DO
+                    transition = [transition, None, None]
+                    stack.append((self.__UNDO, noteIndex, None, transition))
+                    stack.append((self.__VISIT, noteIndex + 1, logProbSum + logProb, None))
+                    stack.append((self.__DO, noteIndex, None, transition))
+
+    __VISIT = 0
+    __DO = 1
+    __UNDO = 2
+
+    # /**
+    #  * Get the transitions to try for the given note, in the order in which to try them.
+    #  *
+    #  * @return A List of (transition, log probability) pairs. A transition is either the index of an existing
+    #  * voice, or -i - 1 for a new voice inserted at index i. Once the budget is exhausted (with an empty beam),
+    #  * only the single most likely transition is returned, so that one greedy path is completed.
+    #  */
+
+    def __getChildren(self, openVoiceIndices, noteIndex, newVoices):
+        newVoiceProbs = [self.__scorer.getNewVoiceProb(noteIndex, i, newVoices) for i in range(len(newVoices) + 1)]
+        existingVoiceProbs = [self.__scorer.getExistingProb(noteIndex, voiceIndex, newVoices)
+                              for voiceIndex in openVoiceIndices[noteIndex]]
+
+        maxIndex = MathUtils.getMaxIndex(newVoiceProbs)
+        maxExistingIndex = MathUtils.getMaxIndex(existingVoiceProbs)
+
+        if self.__budget.isExhausted():
+            if maxExistingIndex != -1 and (maxIndex == -1 or
+                                           existingVoiceProbs[maxExistingIndex] >= newVoiceProbs[maxIndex]):
+                return [(openVoiceIndices[noteIndex][maxExistingIndex], existingVoiceProbs[maxExistingIndex])]
             if maxIndex != -1:
-                self.__addNewVoicesRecursive(openVoiceIndices, incoming, newVoices, logProbSum, noteIndex,
-                                             newVoiceProbs, newVoiceProbs[maxIndex], newStates)
+                return [(-maxIndex - 1, newVoiceProbs[maxIndex])]
+            return []
+
+        children = []
+        if maxIndex != -1:
+            # Add at any location with max probability
+            for newVoiceIndex in range(len(newVoiceProbs)):
+                if newVoiceProbs[newVoiceIndex] == newVoiceProbs[maxIndex]:
+                    children.append((-newVoiceIndex - 1, newVoiceProbs[newVoiceIndex]))
 
         # Add to existing voices
-        existingVoiceProbs = [0 for _ in range(len(openVoiceIndices[noteIndex]))]
-        i = 0
-        while i < len(existingVoiceProbs):
-            existingVoiceProbs[i] = self.__getTransitionProb(incoming[noteIndex], openVoiceIndices[noteIndex][i],
-                                                             newVoices)
-            i += 1
-
-        self.__addToExistingVoicesRecursive(openVoiceIndices, incoming, newVoices, logProbSum, noteIndex,
-                                            existingVoiceProbs, newStates)
-
-        return newStates
-
-    def __addNewVoicesRecursive(self, openVoiceIndices, incoming, newVoices, logProbSum, noteIndex, newVoiceProbs,
-                                maxValue, newStates):
-        self.curr_time = time.time()
-        if round(self.curr_time - self.start_time) > 20:
-            return
-        if len(newVoices) < sys.maxsize:
-            newVoiceIndex = 0
-            while newVoiceIndex < len(newVoiceProbs):
-                if newVoiceProbs[newVoiceIndex] == maxValue:
-                    # Add at any location with max probability
-                    self.__doTransition(incoming[noteIndex], -newVoiceIndex - 1, newVoices)
-
-                    # Fix openVoiceIndices
-                    note = noteIndex + 1
-                    while note < len(openVoiceIndices):
-                        voice = 0
-                        while voice < len(openVoiceIndices[note]):
-                            if openVoiceIndices[note][voice] >= newVoiceIndex:
-                                openVoiceIndices[note][voice] = openVoiceIndices[note][voice] + 1
-                            voice += 1
-                        note += 1
-
-                    # (Pseudo-)recursive call
-                    for temp in self.__getAllCandidateNewStatesRecursive(openVoiceIndices, incoming, newVoices,
-                                                                         logProbSum + newVoiceProbs[newVoiceIndex],
-                                                                         noteIndex + 1):
-                        bisect.insort(newStates, temp)
-
-                    # Fix for memory overflow - trim newStates as soon as we can
-
-                    while len(newStates) > self.__params.BEAM_SIZE:
-                        newStates.pop()
-
-                    # The objects are mutable, so reverse changes. This helps with memory usage as well.
-                    self.__reverseTransition(-newVoiceIndex - 1, newVoices)
-
-                    # Reverse openVoiceIndices
-                    note = noteIndex + 1
-                    while note < len(openVoiceIndices):
-                        voice = 0
-                        while voice < len(openVoiceIndices[note]):
-                            if openVoiceIndices[note][voice] > newVoiceIndex:
-                                openVoiceIndices[note][voice] = openVoiceIndices[note][voice] - 1
-                            voice += 1
-                        note += 1
-                newVoiceIndex += 1
-
-    def __addToExistingVoicesRecursive(self, openVoiceIndices, incoming, newVoices, logProbSum, noteIndex,
-                                       existingVoiceProbs, newStates):
-        self.curr_time = time.time()
-        if round(self.curr_time - self.start_time) > 20:
+        for openVoiceIndex in range(len(existingVoiceProbs)):
+            children.append((openVoiceIndices[noteIndex][openVoiceIndex], existingVoiceProbs[openVoiceIndex]))
+        return children
+
+    # /**
+    #  * Decide whether to stop expanding. That is the case once the budget is exhausted, as long as the
+    #  * beam already holds a complete state to return.
+    #  *
+    #  * @return True if the expansion should stop. False otherwise.
+    #  */
+
+    def __isStopped(self):
+        return self.__budget.isExhausted() and not self.__beam.isEmpty()
+
+    # /**
+    #  * Update openVoiceIndices for the notes after the given one, following the given transition.
+    #  *
+    #  * @return For an existing voice, the indices of the notes it was removed from. None for a new voice.
+    #  */
+
+    def __fixOpenVoiceIndices(self, openVoiceIndices, noteIndex, transition):
+        if transition < 0:
+            # A new voice shifts every voice at or after it
+            newVoiceIndex = -transition - 1
+            for note in range(noteIndex + 1, len(openVoiceIndices)):
+                indices = openVoiceIndices[note]
+                for voice in range(len(indices)):
+                    if indices[voice] >= newVoiceIndex:
+                        indices[voice] += 1
+            return None
+
+        # An existing voice can only take one note per onset
+        removed = []
+        for note in range(noteIndex + 1, len(openVoiceIndices)):
+            if transition in openVoiceIndices[note]:
+                openVoiceIndices[note].remove(transition)
+                removed.append(note)
+        return removed
+
+    def __reverseOpenVoiceIndices(self, openVoiceIndices, noteIndex, transition, removed):
+        if transition < 0:
+            newVoiceIndex = -transition - 1
+            for note in range(noteIndex + 1, len(openVoiceIndices)):
+                indices = openVoiceIndices[note]
+                for voice in range(len(indices)):
+                    if indices[voice] > newVoiceIndex:
+                        indices[voice] -= 1
             return
-        openVoiceIndex = 0
-        while openVoiceIndex < len(existingVoiceProbs):
-            # Try the transition
-            voiceIndex = openVoiceIndices[noteIndex][openVoiceIndex]
-            self.__doTransition(incoming[noteIndex], voiceIndex, newVoices)
-            # Fix openVoiceIndices
-            removed = [False for _ in range(len(openVoiceIndices))]
-            note = noteIndex + 1
-            while note < len(openVoiceIndices):
-
-                if openVoiceIndices[note].__contains__(voiceIndex):
-                    openVoiceIndices[note].remove(voiceIndex)
-                    removed[note] = True
-                note += 1
-            # (Pseudo-)recursive call
-            for temp in self.__getAllCandidateNewStatesRecursive(openVoiceIndices, incoming, newVoices,
-                                                                 logProbSum + existingVoiceProbs[openVoiceIndex],
-                                                                 noteIndex + 1):
-                bisect.insort(newStates, temp)
-
-            # Remove extras from newStates to save memory
-            while len(newStates) > self.__params.BEAM_SIZE:
-                newStates.pop()
-
-            # Reverse transition
-            self.__reverseTransition(voiceIndex, newVoices)
-
-            # Reverse openVoiceIndices
-            j = noteIndex + 1
-            while j < len(removed):
-                if removed[j]:
-                    note = None
-                    note = 0
-                    while note < len(openVoiceIndices[j]) and openVoiceIndices[j][note] < voiceIndex:
-                        pass
-                        note += 1
-                    openVoiceIndices[j].insert(note, voiceIndex)
-                j += 1
-            openVoiceIndex += 1
+
+        for note in removed:
+            bisect.insort(openVoiceIndices[note], transition)
 
     def __getOpenVoiceIndices(self, incoming, voices):
         onsetTime = incoming[0].getOnsetTime()
         openIndices = []
         for note in incoming:
             noteOpen = []
+            duration = note.getDurationTime() if note is not None else 0
             i = 0
             while i < len(voices):
                 if note is not None and voices[i] is not None:
-                    if voices[i].canAddNoteAtTime(onsetTime, note.getDurationTime(), self.__params):
+                    if voices[i].canAddNoteAtTime(onsetTime, duration, self.__params):
                         noteOpen.append(i)
                 i += 1
             openIndices.append(noteOpen)
         return openIndices
 
-    def __reverseTransition(self, transition, newVoices):
-        self.curr_time = time.time()
-        if round(self.curr_time - self.start_time) > 20:
-            return
+    def __reverseTransition(self, transition, newVoices, linkCount):
         # For new Voices, we need to add the Voice, and then update the transition value to
         # point to that new Voice so the lower code works.
-        if transition < 0 and newVoices.__contains__(-transition - 1):
-            newVoices.remove(-transition - 1)
+        if transition < 0:
+            del newVoices[-transition - 1]
         elif newVoices[transition]:
             newVoices[transition] = newVoices[transition].get_previous()
+        if linkCount is not None:
+            self.__linkCounts[linkCount] -= 1
 
-    def __doTransition(self, note, transition, newVoices):
-        self.curr_time = time.time()
-        if round(self.curr_time - self.start_time) > 20:
-            return
-        # For new Voices, we need to add the Voice, and then update the transition value to
-        # point to that new Voice so the lower code works.
-        if transition < 0:
-            transition = -transition - 1
-            newVoices.insert(transition, Voice(note, None))
-        else:
-            newVoices[transition] = Voice(note, newVoices[transition])
-
-    def __getTransitionProb(self, note, transition, newVoices):
-        self.curr_time = time.time()
-
-        logProb = None
+    # /**
+    #  * Apply the given transition to newVoices, and count the link it makes, if any.
+    #  *
+    #  * @return The index in {@link #linkCounts} of the count which was incremented (0 for a true positive,
+    #  * 1 for a false positive), or None.
+    #  */
 
+    def __doTransition(self, note, transition, newVoices):
+        self.__budget.spend()
         # For new Voices, we need to add the Voice, and then update the transition value to
         # point to that new Voice so the lower code works.
         if transition < 0:
             transition = -transition - 1
-            logProb = math.log(self.__params.NEW_VOICE_PROBABILITY)
-            prev = None if transition == 0 else newVoices[transition - 1]
-            next = None if transition == len(newVoices) else newVoices[transition]
-        else:
-            if newVoices[transition] is not None:
-                logProb = math.log(newVoices[transition].getProbability(note, self.__params))
-            prev = None if transition == 0 else newVoices[transition - 1]
-            next = None if transition == len(newVoices) - 1 else newVoices[transition + 1]
-
-        # Check if we are in the wrong order with the prev or next Voices (or both)
-        if prev is not None and note.getPitch() < prev.get_most_recent_note().getPitch():
-            if logProb is not None:
-                logProb = logProb - math.log(2)
-            else:
-                logProb = 1.7976931348623157e+308
-
-        if next is not None and note.getPitch() > next.get_most_recent_note().getPitch():
-            if logProb is not None:
-                logProb = logProb - math.log(2)
-            else:
-                logProb = 1.7976931348623157e+308
-
-        if logProb == -float("-inf") or logProb is None:
-            logProb = 1.7976931348623157e+308
-
-        return logProb
+            newVoices.insert(transition, Voice(note, None, self.__params.PITCH_HISTORY_LENGTH))
+            return None
+
+        prev = newVoices[transition]
+        newVoices[transition] = Voice(note, prev, self.__params.PITCH_HISTORY_LENGTH)
+        if self.__goldStandard is None:
+            return None
+        linkCount = 0 if self.__goldStandard.isLink(prev.get_most_recent_note(), note) else 1
+        self.__linkCounts[linkCount] += 1
+        return linkCount
+
+    # /**
+    #  * Get the signature of this state's voice frontier: the signature of each voice, in order.
+    #  * States with the same signature will score every future note identically.
+    #  *
+    #  * @return A hashable signature of this state's frontier.
+    #  */
+
+    def getFrontierSignature(self):
+        if self.__signature is None:
+            self.__signature = tuple(voice.getFrontierSignature() for voice in self.__voices)
+        return self.__signature
 
     def getVoices(self):
         return self.__voices
 
+    def getTruePositives(self):
+        return self.__truePositives
+
+    def getFalsePositives(self):
+        return self.__falsePositives
+
     def get_score(self):
         return self.__logProb
 
@@ -245,4 +287,5 @@ class HmmVoiceSplittingModelState(VoiceSplittingModelState):
         return str(self.__voices) + " " + str(self.__logProb)
 
     def __lt__(self, other):
-        return (self.__logProb, len(self.__voices)) < (other.__logProb, len(other.__voices))
+        # Best first: higher log probability, then fewer voices
+        return (-self.__logProb, len(self.__voices)) < (-other.__logProb, len(other.__voices))
@@ -2,7 +2,7 @@
 #  * An <code>HmmVoiceSplittingModelTester</code> contains the {@link #main(String[])} method used
 #  * to train and test the {@link HmmVoiceSplittingModel} class from the command line.
 #  * <p>
-#  * It can run multiple threads (total number according to {@link #NUM_PROCS}) simultaneously, managing
+#  * It can run multiple processes (total number according to {@link #NUM_PROCS}) simultaneously, managing
 #  * return values and reporting the best setting for {@link HmmVoiceSplittingModelParameters}.
 #  * <p>
 #  * This was the class used to perform training for the paper.
@@ -16,14 +16,21 @@ import math
 import multiprocessing
 import os.path
 import sys
+import time
 from decimal import Decimal
 
+from corpuscache import CorpusCache
 from eventparser import EventParser
+from goldstandard import GoldStandard
 from hmmvoicesplittingmodel import HmmVoiceSplittingModel
 from hmmvoicesplittingmodelparameters import HmmVoiceSplittingModelParameters
 from hmmvoicesplittingmodelreturn import HmmVoiceSplittingModelTesterReturn
+from hmmvoicesplittingmodelsongreturn import HmmVoiceSplittingModelSongReturn
 from midiwriter import MidiWriter
 from notelistgenerator import NoteListGenerator
+from racingevaluator import RacingEvaluator
+from resultstore import ResultStore
+from searchstrategy import CoordinateDescentSearch, GridSearch, ParameterSpace, SurrogateSearch
 from timetracker import TimeTracker
 
 
@@ -43,6 +50,18 @@ class HmmVoiceSplittingModelTester:
         self.USE_CHANNEL = True
         self.VERBOSE = False
         self.EPSILON = 0.000000001
+        self.BUDGET = (HmmVoiceSplittingModelParameters.MAX_ONSET_EXPANSIONS_DEFAULT,
+                       HmmVoiceSplittingModelParameters.MAX_SONG_EXPANSIONS_DEFAULT,
+                       HmmVoiceSplittingModelParameters.MAX_ONSET_SECONDS_DEFAULT,
+                       HmmVoiceSplittingModelParameters.MAX_SONG_SECONDS_DEFAULT)
+        self.RECOMBINE = HmmVoiceSplittingModelParameters.RECOMBINE_DEFAULT
+        self.PARALLEL_SONGS = False
+        self.CACHE_DIR = None
+        self.USE_MIDO = False
+        self.SEARCH = None
+        self.SEARCH_EVALUATIONS = 200
+        self.RACE_DELTA = None
+        self.RESULT_STORE = None
 
     def set_params(self, params):
         self.__parametersList = params
@@ -60,6 +79,7 @@ class HmmVoiceSplittingModelTester:
         GSM = HmmVoiceSplittingModelParameters.GAP_STD_MICROS_DEFAULT
         PS = HmmVoiceSplittingModelParameters.PITCH_STD_DEFAULT
         MGS = HmmVoiceSplittingModelParameters.MIN_GAP_SCORE_DEFAULT
+        XO, XS, DO, DS = self.BUDGET
 
         steps = 5
 
@@ -86,6 +106,8 @@ class HmmVoiceSplittingModelTester:
                         dir = args[i]
                     except:
                         self.argumentError("-w requires a directory to be given")
+                elif args[i][1] == 'c':
+                    self.RECOMBINE = False
                 elif args[i][1] == 'v':
                     self.VERBOSE = True
                 elif args[i][1] == 't':
@@ -135,6 +157,77 @@ class HmmVoiceSplittingModelTester:
                         MGS = Decimal(args[i])
                     except Exception:
                         self.argumentError("-m")
+                elif args[i][1] == 'C':
+                    try:
+                        i += 1
+                        self.CACHE_DIR = args[i]
+                    except Exception:
+                        self.argumentError("-C requires a directory to be given")
+                elif args[i][1] == 's':
+                    try:
+                        i += 1
+                        self.RESULT_STORE = args[i]
+                    except Exception:
+                        self.argumentError("-s requires a file to be given")
+                elif args[i][1] == 'P':
+                    self.PARALLEL_SONGS = True
+                elif args[i][1] == 'I':
+                    self.USE_MIDO = True
+                elif args[i][1] == 'R':
+                    self.RACE_DELTA = RacingEvaluator.DELTA_DEFAULT
+                    try:
+                        i += 1
+                        self.RACE_DELTA = float(args[i])
+                        if not 0 < self.RACE_DELTA < 1:
+                            self.argumentError("-R requires a probability between 0 and 1")
+                    except ValueError:
+                        i -= 1
+                    except IndexError:
+                        i -= 1
+                elif args[i][1] == 'S':
+                    tune = True
+                    try:
+                        i += 1
+                        self.SEARCH = args[i]
+                        if self.SEARCH not in ('grid', 'coordinate', 'surrogate'):
+                            raise ValueError(self.SEARCH)
+                    except Exception:
+                        self.argumentError("-S requires grid, coordinate or surrogate")
+                    try:
+                        i += 1
+                        self.SEARCH_EVALUATIONS = int(args[i])
+                    except Exception:
+                        i -= 1
+                elif args[i][1] == 'j':
+                    try:
+                        i += 1
+                        self.NUM_PROCS = int(args[i])
+                    except Exception:
+                        self.argumentError("-j")
+                elif args[i][1] == 'x':
+                    try:
+                        i += 1
+                        XO = int(args[i])
+                    except Exception:
+                        self.argumentError("-x")
+                elif args[i][1] == 'X':
+                    try:
+                        i += 1
+                        XS = int(args[i])
+                    except Exception:
+                        self.argumentError("-X")
+                elif args[i][1] == 'd':
+                    try:
+                        i += 1
+                        DO = float(args[i])
+                    except Exception:
+                        self.argumentError("-d")
+                elif args[i][1] == 'D':
+                    try:
+                        i += 1
+                        DS = float(args[i])
+                    except Exception:
+                        self.argumentError("-D")
                 elif args[i][1] == 'M':
                     try:
                         i += 1
@@ -145,6 +238,7 @@ class HmmVoiceSplittingModelTester:
                 else:
                     self.argumentError(args[i])
             i += 1
+        self.BUDGET = (XO, XS, DO, DS)
         self.getSongs(self.files)
 
         if live:
@@ -153,10 +247,12 @@ class HmmVoiceSplittingModelTester:
         else:
             params = HmmVoiceSplittingModelParameters()
             params.set_fields(BS, NVP, PHL, GSM, PS, MGS)
+        params.set_budget(*self.BUDGET)
+        params.RECOMBINE = self.RECOMBINE
 
         if tune:
-            best = self.tune(steps)
-            if best is None:
+            best = self.tune(steps, self.getSearchStrategy(self.SEARCH, steps, params))
+            if best is not None:
                 params = best
 
         if run or extract or dir is not None:
@@ -172,13 +268,100 @@ class HmmVoiceSplittingModelTester:
     #  * Tune the {@link HmmVoiceSplittingModelParameters}.
     #  *
     #  * @param steps The number of steps to make in our grid search.
+    #  * @param strategy The {@link SearchStrategy} which chooses the parameters to evaluate. By default, the
+    #  *        grid of {@link #getGrid(int)}.
+    #  * With {@link #RACE_DELTA} set, each batch of parameters is raced by a {@link RacingEvaluator}, and
+    #  * abandoned parameters can never be the best. With {@link #RESULT_STORE} set, parameters already evaluated
+    #  * on this corpus are read from that {@link ResultStore} instead, and new results are added to it.
     #  * @return The best {@link HmmVoiceSplittingModelParameters} we found.
     #  *
     #  * @throws ExecutionException If there is some generic execution exception.
     #  * @throws InterruptedException If there is some interrupt received.
     #  */
 
-    def tune(self, steps):
+    def tune(self, steps, strategy=None):
+        if strategy is None:
+            strategy = GridSearch(self.getGrid(steps))
+
+        racer = None if self.RACE_DELTA is None else RacingEvaluator(self, self.RACE_DELTA)
+        store = None
+        if self.RESULT_STORE is not None:
+            store = ResultStore(self.RESULT_STORE, self.files, self.USE_CHANNEL)
+
+        best = HmmVoiceSplittingModelTesterReturn()
+        best.set_defaults()
+        try:
+            batch = strategy.getNextBatch()
+            while batch:
+                for testerRun in self.evaluateBatch(batch, racer, store):
+                    strategy.observe(testerRun)
+                    if not testerRun.isAbandoned() and testerRun.getF1() > best.getF1():
+                        best = testerRun
+                    print(testerRun)
+                batch = strategy.getNextBatch()
+        finally:
+            if racer is not None:
+                racer.close()
+
+        print("Best: " + str(best))
+        return best.getParameters()
+
+    # /**
+    #  * Evaluate a batch of parameters for {@link #tune(int, SearchStrategy)}.
+    #  *
+    #  * @param batch A List of the {@link HmmVoiceSplittingModelParameters} to evaluate.
+    #  * @param racer The {@link RacingEvaluator} to race them with, or None to run each on every song.
+    #  * @param store The {@link ResultStore} to read and add results to, or None.
+    #  * @return An iterator over the {@link HmmVoiceSplittingModelTesterReturn}s, stored ones first. Stored
+    #  *         ones are offered to the racer as its incumbent, so that they are raced against without being
+    #  *         run again.
+    #  */
+
+    def evaluateBatch(self, batch, racer, store):
+        pending = []
+        for params in batch:
+            stored = None if store is None else store.load(params)
+            if stored is None:
+                pending.append(params)
+            else:
+                if racer is not None:
+                    racer.offer(stored)
+                yield stored
+        if not pending:
+            return
+
+        for testerRun in (self.runTests(pending) if racer is None else racer.race(pending)):
+            if store is not None:
+                store.store(testerRun)
+            yield testerRun
+
+    # /**
+    #  * Create the {@link SearchStrategy} of the given name.
+    #  *
+    #  * @param name grid, coordinate or surrogate. None is the same as grid.
+    #  * @param steps The number of steps to make in the grid search, and the number of values on each line of
+    #  *        the coordinate descent.
+    #  * @param params The parameters the search starts from, see {@link ParameterSpace}.
+    #  * @return The SearchStrategy, which evaluates at most {@link #SEARCH_EVALUATIONS} parameter sets
+    #  *         (except for the grid, which is always evaluated in full).
+    #  */
+
+    def getSearchStrategy(self, name, steps, params):
+        if name is None or name == 'grid':
+            return GridSearch(self.getGrid(steps))
+        space = ParameterSpace(params)
+        if name == 'coordinate':
+            return CoordinateDescentSearch(space, self.SEARCH_EVALUATIONS, steps)
+        return SurrogateSearch(space, self.SEARCH_EVALUATIONS, max(1, self.NUM_PROCS))
+
+    # /**
+    #  * Get the parameter sets of the grid search.
+    #  *
+    #  * @param steps The number of steps to make within each parameter range.
+    #  * @return A List of the {@link HmmVoiceSplittingModelParameters} of the grid.
+    #  */
+
+    def getGrid(self, steps):
         bsMin = 10
         bsMax = 11
         nvpMin = 1E-9
@@ -214,6 +397,8 @@ class HmmVoiceSplittingModelTester:
                             while bsMax - BS > self.EPSILON:
                                 temp_param = HmmVoiceSplittingModelParameters()
                                 temp_param.set_fields(int(round(BS)), NVP, int(round(PHL)), GSM, PS, MGS)
+                                temp_param.set_budget(*self.BUDGET)
+                                temp_param.RECOMBINE = self.RECOMBINE
                                 testList.append(temp_param)
                                 BS += bsStep
                             MGS += mgsStep
@@ -221,15 +406,27 @@ class HmmVoiceSplittingModelTester:
                     GSM += gsmStep
                 PHL += phlStep
             NVP += nvpStep
+        return testList
 
-        temp_param = HmmVoiceSplittingModelParameters()
-        temp_param.set_fields(int(round(BS)), NVP, int(round(PHL)), GSM, PS, MGS)
-        best = HmmVoiceSplittingModelTesterReturn()
-        best.set_defaults()
-        testerRun = self.runTest(temp_param, False, None)
-        if testerRun.getF1() > best.getF1():
-            best = testerRun
-        print(testerRun)
+    # /**
+    # * Run {@link #runTest(HmmVoiceSplittingModelParameters, bool, str)} on each of the given parameters,
+    # * spread over a pool of {@link #NUM_PROCS} worker processes.
+    # *
+    # * @param paramList A List of the {@link HmmVoiceSplittingModelParameters} to test.
+    # * @return An iterator over the {@link HmmVoiceSplittingModelTesterReturn}s, in the order they finish.
+    # */
+
+    def runTests(self, paramList):
+        if self.NUM_PROCS <= 1 or len(paramList) <= 1:
+            for param in paramList:
+                yield self.runTest(param, False, None)
+            return
+
+        procs = min(self.NUM_PROCS, len(paramList))
+        chunkSize = max(1, len(paramList) // (procs * 4))
+        with multiprocessing.Pool(procs, initializer=_initWorker, initargs=(self,)) as pool:
+            for result in pool.imap_unordered(_runTestWorker, paramList, chunkSize):
+                yield result
 
     def call(self, paramList):
         best = HmmVoiceSplittingModelTesterReturn()
@@ -241,23 +438,13 @@ class HmmVoiceSplittingModelTester:
         return best
 
     def runTest(self, params, extract, dir):
-        voiceAccSum = 0
-        recall = 0
-        precision = 0
-        songIndex = -1
-        tempIndex = songIndex
-        for nlg in self.songs:
-            tempIndex = tempIndex + 1
-            gs = self.goldStandard[tempIndex]
+        scores = []
+        seconds = 0
+        for tempIndex, songReturn in enumerate(self.evaluateSongs(params, extract or dir is not None)):
+            nlg = self.songs[tempIndex]
             if self.VERBOSE:
                 print(os.path.abspath(self.files[tempIndex]))
-            voiceCount = set([])
-            for note in nlg.getNoteList():
-                voiceCount.add(note.get_correct_voice())
-            voiceAccSongSum = 0
-            vs = HmmVoiceSplittingModel(params)
-            self.performInference(vs, nlg)
-            if not vs.get_hypotheses():
+            if songReturn is None:
                 print('Error: No result found.')
                 sys.exit(1)
             if self.MAX_VOICES != sys.maxsize:
@@ -265,75 +452,219 @@ class HmmVoiceSplittingModelTester:
                 sys.exit(1)
                 continue
 
-            # voices = []
-            voices = vs.get_hypotheses()[0].getVoices()
+            voices = None
+            if extract or dir is not None:
+                voices = songReturn.getVoices(nlg.getNoteList())
             if extract:
                 self.getExtractString(voices, tempIndex)
 
-            songTruePositives = 0
-            songFalsePositives = 0
-            songNoteCount = 0
-
-            for i in range(len(vs.get_hypotheses())):
-                for voice in vs.get_hypotheses()[i].getVoices():
-                    if voice:
-                        voiceNumNotes = voice.get_num_notes()
-                        voiceCorrect = voice.getNumNotesCorrect()
-                        voiceTruePositives = voice.getNumLinksCorrect(gs)
-                        voiceFalsePositives = voiceNumNotes - voiceTruePositives - 1
-                        songNoteCount += voiceNumNotes
-                        voiceAccSongSum += float(voiceCorrect) / float(voiceNumNotes)
-                        songTruePositives += voiceTruePositives
-                        songFalsePositives += voiceFalsePositives
-                        if self.VERBOSE:
-                            print(str(voiceCorrect) + '/' + str(voiceNumNotes) + '=' + str(voiceAccSongSum))
-
-            songFalseNegatives = songNoteCount - len(voiceCount) - songTruePositives
-
-            if len(voices) != 0:
-                voiceAccSum += float(voiceAccSongSum) / float(len(voices))
-
-            if songTruePositives != 0 and songFalsePositives != 0:
-                precision += (float(songTruePositives)) / float((songTruePositives + songFalsePositives))
+            voiceAccSongSum = 0
+            if self.VERBOSE:
+                for voiceCorrect, voiceNumNotes in songReturn.getVoiceStats():
+                    voiceAccSongSum += float(voiceCorrect) / float(voiceNumNotes)
+                    print(str(voiceCorrect) + '/' + str(voiceNumNotes) + '=' + str(voiceAccSongSum))
 
-            if songTruePositives != 0 and songFalseNegatives != 0:
-                recall += (float(songTruePositives)) / float((songTruePositives + songFalseNegatives))
+            songScores = self.scoreSong(tempIndex, songReturn)
+            scores.append(songScores)
+            seconds += songReturn.getSeconds()
 
             if self.VERBOSE:
-                print("P=" + str(((float(songTruePositives)) / float((songTruePositives + songFalsePositives)))))
-                print("R=" + str(((float(songTruePositives)) / float((songTruePositives + songFalseNegatives)))))
-                print("F1=" + str((2 * (float(songTruePositives)) / (
-                        2 * songTruePositives + songFalseNegatives + songFalsePositives))))
+                voiceC, songPrecision, songRecall = songScores
+                print("P=" + str(songPrecision))
+                print("R=" + str(songRecall))
+                print("F1=" + str(self.getSongF1(songScores)))
 
             if dir is not None:
                 if not os.path.exists(dir):
                     os.makedirs(dir)
                 fName = os.path.basename(self.files[tempIndex])
                 fileName = dir + '//' + fName
-                writer = MidiWriter(fileName, self.tts[songIndex])
+                writer = MidiWriter(fileName, self.tts[tempIndex])
 
                 for voice in voices:
-                    for midiNode in voice.get_notes():
+                    for midiNode in voice:
                         writer.add_midi_note(midiNode)
                 writer.write()
                 print('Output successfully written to ' + dir)
 
-        if self.songs:
-            voiceC = float(voiceAccSum) / float(len(self.songs))
-            recall /= float(len(self.songs))
-            precision /= float(len(self.songs))
+        result = self.getTesterReturn(params, scores)
+        result.setSeconds(seconds)
+        return result
+
+    # /**
+    # * Score the result of a single song.
+    # *
+    # * @param songIndex The index of the song in {@link #songs}.
+    # * @param songReturn The {@link HmmVoiceSplittingModelSongReturn} of the song.
+    # * @return A (voice consistency, precision, recall) tuple for the song. Undefined values are 0.
+    # */
+
+    def scoreSong(self, songIndex, songReturn):
+        songTruePositives = songReturn.getTruePositives()
+        songFalsePositives = songReturn.getFalsePositives()
+        songFalseNegatives = self.goldStandard[songIndex].getNumLinks() - songTruePositives
+
+        voiceC = 0
+        if songReturn.getNumVoices() != 0:
+            voiceC = float(songReturn.getVoiceAccSum()) / float(songReturn.getNumVoices())
+
+        precision = 0
+        if songTruePositives + songFalsePositives != 0:
+            precision = (float(songTruePositives)) / float((songTruePositives + songFalsePositives))
+
+        recall = 0
+        if songTruePositives + songFalseNegatives != 0:
+            recall = (float(songTruePositives)) / float((songTruePositives + songFalseNegatives))
+
+        return voiceC, precision, recall
+
+    # /**
+    # * Get the F1 of a single song.
+    # *
+    # * @param songScores The (voice consistency, precision, recall) tuple of the song, see {@link #scoreSong}.
+    # * @return The F1 of the song, or 0 if its precision and recall are both 0.
+    # */
+
+    @staticmethod
+    def getSongF1(songScores):
+        voiceC, precision, recall = songScores
+        if precision + recall == 0:
+            return 0.0
+        return 2 * precision * recall / (precision + recall)
+
+    # /**
+    # * Average the scores of some songs.
+    # *
+    # * @param params The parameters the songs were run with.
+    # * @param scores A List of the (voice consistency, precision, recall) tuple of each song.
+    # * @return The {@link HmmVoiceSplittingModelTesterReturn} of the songs, with NaN scores if there are none.
+    # *         If there are scores for all of the songs, they are kept as its song scores, and must then be in
+    # *         the order of {@link #songs}.
+    # */
+
+    def getTesterReturn(self, params, scores):
+        if scores:
+            voiceC = sum(score[0] for score in scores) / float(len(scores))
+            precision = sum(score[1] for score in scores) / float(len(scores))
+            recall = sum(score[2] for score in scores) / float(len(scores))
         else:
             voiceC = math.nan
             precision = math.nan
             recall = math.nan
         returns_field = HmmVoiceSplittingModelTesterReturn()
         returns_field.set_fields(params, voiceC, precision, recall)
+        if len(scores) == len(self.songs):
+            returns_field.setSongScores(list(scores))
         return returns_field
 
+    # /**
+    # * Run inference on each song with the given parameters. With {@link #PARALLEL_SONGS}, the songs are
+    # * spread over a pool of {@link #NUM_PROCS} worker processes.
+    # *
+    # * @param params The parameters to use.
+    # * @param keepVoices True to keep the voices of each song, see
+    # *        {@link #evaluateSong(HmmVoiceSplittingModelParameters, int, bool)}.
+    # * @return An iterator over the {@link HmmVoiceSplittingModelSongReturn} of each song (or None, if no
+    # *         result was found), in the order of {@link #songs}.
+    # */
+
+    def evaluateSongs(self, params, keepVoices=False):
+        tasks = [(params, songIndex, keepVoices) for songIndex in range(len(self.songs))]
+        if not self.PARALLEL_SONGS:
+            for task in tasks:
+                yield self.evaluateSong(*task)
+            return
+        for songReturn in self.evaluateTasks(tasks):
+            yield songReturn
+
+    # /**
+    # * Run inference on the given songs, each with its own parameters, spread over a pool of
+    # * {@link #NUM_PROCS} worker processes.
+    # *
+    # * @param tasks A List of (parameters, song index) or (parameters, song index, keep voices) tuples.
+    # * @param pool A pool of worker processes from {@link #createPool()} to run them on, or None to start one
+    # *        for these tasks only.
+    # * @return An iterator over the {@link HmmVoiceSplittingModelSongReturn} of each task (or None, if no
+    # *         result was found), in the order of tasks.
+    # */
+
+    def evaluateTasks(self, tasks, pool=None):
+        if self.NUM_PROCS <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                yield self.evaluateSong(*task)
+            return
+
+        if pool is not None:
+            for songReturn in pool.imap(_evaluateSongWorker, tasks):
+                yield songReturn
+            return
+
+        with self.createPool(min(self.NUM_PROCS, len(tasks))) as pool:
+            for songReturn in pool.imap(_evaluateSongWorker, tasks):
+                yield songReturn
+
+    # /**
+    # * Start a pool of worker processes, each with a copy of this tester.
+    # *
+    # * @param procs The number of processes. By default, {@link #NUM_PROCS}.
+    # * @return The pool. The caller must stop it.
+    # */
+
+    def createPool(self, procs=None):
+        return multiprocessing.Pool(self.NUM_PROCS if procs is None else procs, initializer=_initWorker,
+                                    initargs=(self,))
+
+    # /**
+    # * Run inference on a single song and score its best hypothesis.
+    # *
+    # * @param params The parameters to use.
+    # * @param songIndex The index of the song in {@link #songs}.
+    # * @param keepVoices True to keep the voice of each note in the result, so that the voices can be
+    # *        extracted or written. Scoring does not need them.
+    # * @return The {@link HmmVoiceSplittingModelSongReturn} of the song, or None if no result was found.
+    # */
+
+    def evaluateSong(self, params, songIndex, keepVoices=False):
+        nlg = self.songs[songIndex]
+        gs = self.goldStandard[songIndex]
+        start = time.perf_counter()
+        vs = HmmVoiceSplittingModel(params, gs)
+        self.performInference(vs, nlg)
+        seconds = time.perf_counter() - start
+        if not vs.get_hypotheses():
+            return None
+
+        # Only the best hypothesis is scored. Its link counts were kept up to date during inference.
+        best = vs.get_hypotheses()[0]
+        voices = best.getVoices()
+
+        songTruePositives = best.getTruePositives()
+        songFalsePositives = best.getFalsePositives()
+        songNoteCount = 0
+        voiceAccSongSum = 0
+        voiceStats = []
+
+        for voice in voices:
+            if voice:
+                voiceNumNotes = voice.get_num_notes()
+                voiceCorrect = voice.getNumNotesCorrect()
+                songNoteCount += voiceNumNotes
+                voiceAccSongSum += float(voiceCorrect) / float(voiceNumNotes)
+                voiceStats.append((voiceCorrect, voiceNumNotes))
+
+        songReturn = HmmVoiceSplittingModelSongReturn()
+        voiceAssignment = None
+        if keepVoices:
+            voiceAssignment = HmmVoiceSplittingModelSongReturn.computeVoiceAssignment(voices, nlg.getNoteList())
+        songReturn.set_fields(voiceAssignment, len(voices), songTruePositives, songFalsePositives, songNoteCount,
+                              voiceAccSongSum, voiceStats)
+        songReturn.setSeconds(seconds)
+        return songReturn
+
     # /**
     # * Get the extracted voices as a String.
     # *
-    # * @param voices The voices returned from voice separation.
+    # * @param voices The voices returned from voice separation, each one a List of its notes.
     # * @param songId The index of the song. Used to disambiguate in case multiple songs are being split at once.
     # *
     # * @return The print out of the extracted voices in the following format:
@@ -342,8 +673,8 @@ class HmmVoiceSplittingModelTester:
 
     def getExtractString(self, voices, songId):
         for i in range(len(voices)):
-            if voices[i].get_notes() is not None:
-                note = voices[i].get_notes()[0]
+            if voices[i]:
+                note = voices[i][0]
                 if note is not None:
                     t = i + 1
                     print(str(songId) + ' ' + str(t) + ' ' + str(note.getOnsetTime()) + ' ' + str(
@@ -417,7 +748,19 @@ class HmmVoiceSplittingModelTester:
         print("-e = Extract the separated voices in the following format: songID noteID voiceID onsetTime(microseconds)"
               " offsetTime(microseconds) pitch velocity")
         print("-v = Verbose (print out each song and each individual voice when running)")
+        print("-j INT = Set the number of processes to use (default = the number of CPUs)")
+        print("-P = Run inference on the songs in parallel, using -j processes")
         print("-T = Use tracks as correct voice (instead of channels)")
+        print("-C DIR = Cache the parsed songs in the DIR directory, and read them from there on later runs")
+        print("-S SEARCH [INT] = Train with the given search strategy: grid (the default), coordinate (coordinate")
+        print(" descent) or surrogate (Bayesian optimization), evaluating at most INT parameter sets (default = 200)."
+              " Starts from the -b, -n, -h, -g, -p and -m parameters.")
+        print("-R [DOUBLE] = Race the parameter sets when training, dropping those whose precision and recall")
+        print(" are both worse than the best's, compared song by song with confidence 1 - DOUBLE (default = " + str(
+            RacingEvaluator.DELTA_DEFAULT) + "), before running them on every song")
+        print("-s FILE = Keep the results of training in FILE, and skip parameter sets it already holds for these songs")
+        print("-c = Do not recombine hypotheses with identical voice frontiers")
+        print("-I = Read MIDI files with mido instead of the built-in reader")
         print("Note that either -t, -r, or -e is required for the program to run.")
         print("PARAMETERS (with -r):")
         print("-b INT = Set the Beam Size parameter to the value INT (defualt = " + str(
@@ -434,10 +777,20 @@ class HmmVoiceSplittingModelTester:
             HmmVoiceSplittingModelParameters.MIN_GAP_SCORE_DEFAULT) + ")")
         print(
             "-M INT = Set the maximum number of voices (default = Unlimited). Helps speed up processing in some cases.")
+        print("COMPUTE BUDGET (0 = Unlimited):")
+        print("-x INT = Set the maximum number of expansions per onset (default = " + str(
+            HmmVoiceSplittingModelParameters.MAX_ONSET_EXPANSIONS_DEFAULT) + ")")
+        print("-X INT = Set the maximum number of expansions per song (default = " + str(
+            HmmVoiceSplittingModelParameters.MAX_SONG_EXPANSIONS_DEFAULT) + ")")
+        print("-d DOUBLE = Set the maximum number of seconds per onset (default = " + str(
+            HmmVoiceSplittingModelParameters.MAX_ONSET_SECONDS_DEFAULT) + ")")
+        print("-D DOUBLE = Set the maximum number of seconds per song (default = " + str(
+            HmmVoiceSplittingModelParameters.MAX_SONG_SECONDS_DEFAULT) + ")")
         sys.exit(1)
 
     # /**
     # * Generate a {@link NoteListGenerator}s for each given MIDI File and return them in a List.
+    # * With more than one of {@link #NUM_PROCS}, the files are parsed in a pool of worker processes.
     # *
     # * @param files A List of Files to read (should be MIDI files).
     # * @return A List of the {@link NoteListGenerator}s for each song.
@@ -446,16 +799,93 @@ class HmmVoiceSplittingModelTester:
     # */
 
     def getSongs(self, files):
-        for f in files:
-            tt = TimeTracker()
-            nlg = NoteListGenerator(tt)
-            ep = EventParser(f, nlg, tt, self.USE_CHANNEL)
-            ep.run()
+        for song in self.loadSongs(files):
+            nlg, tt, goldStandard = song
             self.songs.append(nlg)
             self.tts.append(tt)
-            self.goldStandard.append(ep.goldStandard)
+            self.goldStandard.append(GoldStandard(goldStandard))
         return self.songs
 
+    # /**
+    # * Load the given MIDI Files, from the cache in {@link #CACHE_DIR} if there is one, or by parsing them.
+    # * Worker processes send each song back in the compact form of {@link CorpusCache#encodeSong}.
+    # *
+    # * @param files A List of Files to read (should be MIDI files).
+    # * @return An iterator over the (NoteListGenerator, TimeTracker, gold standard) tuple of each file,
+    # *         in the order of files.
+    # */
+
+    def loadSongs(self, files):
+        if self.NUM_PROCS <= 1 or len(files) <= 1:
+            cache = None if self.CACHE_DIR is None else CorpusCache(self.CACHE_DIR)
+            for f in files:
+                song = None if cache is None else cache.load(f, self.USE_CHANNEL)
+                if song is None:
+                    song = self.parseSong(f)
+                    if cache is not None:
+                        cache.store(f, self.USE_CHANNEL, *song)
+                yield song
+            return
+
+        procs = min(self.NUM_PROCS, len(files))
+        chunkSize = max(1, len(files) // (procs * 4))
+        with multiprocessing.Pool(procs, initializer=_initWorker, initargs=(self,)) as pool:
+            for arrays in pool.imap(_loadSongWorker, files, chunkSize):
+                yield CorpusCache.decodeSong(arrays)
+
+    # /**
+    # * Load the given MIDI File in compact form, from the cache if there is one, or by parsing it.
+    # *
+    # * @param f The File to read (should be a MIDI file).
+    # * @return A dict of NumPy arrays, see {@link CorpusCache#decodeSong(dict)}.
+    # */
+
+    def loadSongArrays(self, f):
+        cache = None if self.CACHE_DIR is None else CorpusCache(self.CACHE_DIR)
+        arrays = None if cache is None else cache.loadArrays(f, self.USE_CHANNEL)
+        if arrays is None:
+            arrays = CorpusCache.encodeSong(*self.parseSong(f))
+            if cache is not None:
+                cache.storeArrays(f, self.USE_CHANNEL, arrays)
+        return arrays
+
+    # /**
+    # * Parse the given MIDI File.
+    # *
+    # * @param f The File to read (should be a MIDI file).
+    # * @return A (NoteListGenerator, TimeTracker, gold standard) tuple for the song.
+    # */
+
+    def parseSong(self, f):
+        tt = TimeTracker()
+        nlg = NoteListGenerator(tt)
+        ep = EventParser(f, nlg, tt, self.USE_CHANNEL, self.USE_MIDO)
+        ep.run()
+        return nlg, tt, ep.goldStandard
+
+
+# The tester of this worker process, see HmmVoiceSplittingModelTester#runTests.
+_workerTester = None
+
+
+def _initWorker(tester):
+    global _workerTester
+    _workerTester = tester
+    # Worker processes cannot start pools of their own
+    _workerTester.PARALLEL_SONGS = False
+
+
+def _runTestWorker(params):
+    return _workerTester.runTest(params, False, None)
+
+
+def _loadSongWorker(f):
+    return _workerTester.loadSongArrays(f)
+
+
+def _evaluateSongWorker(task):
+    return _workerTester.evaluateSong(*task)
+
 
 if __name__ == '__main__':
     hmm = HmmVoiceSplittingModelTester()
@@ -32,7 +32,27 @@ class KeySignature:
     def __str__(self):
         return str(self.__key)
 
-    # TODO Equals method and hashcode if possible
+    #     /**
+    #      * Get the hash code of this KeySignature object.
+    #      *
+    #      * @return The hash code of this object.
+    #      */
+
+    def __hash__(self):
+        return hash(self.__key)
+
+    # 	/**
+    # 	 * Return whether the given Object is equal to this one, which is only the case
+    # 	 * when the given Object is a KeySignature, and its {@link #key} field is equal to this one's.
+    # 	 *
+    # 	 * @param other The object we are checking for equality.
+    # 	 * @return True if the given Object is equal to this one. False otherwise.
+    # 	 */
+
+    def __eq__(self, other):
+        if not(isinstance(other, KeySignature)):
+            return False
+        return self.get_key() == other.get_key()
 
 # import math
 #
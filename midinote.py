@@ -1,30 +1,56 @@
+# /**
+#  * A <code>MidiNote</code> is a single note: its pitch, velocity, onset and offset, correct voice and
+#  * guessed voice. It is a view of one row of a {@link NoteTable}, which holds its fields, so that a note costs
+#  * only the view itself and whole note lists can be sorted and grouped on the table's columns.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+
 class MidiNote:
 
-    def __init__(self, key, velocity, onsetTime, onsetTick, correctVoice, guessedVoice):
-        self.__correctVoice = 0
-        self.__onsetTime = 0
-        self.__onsetTick = 0
-        self.__offsetTime = 0
-        self.__offsetTick = 0
-        self.__velocity = 0
-        self.__pitch = 0
-        self.__guessedVoice = 0
-
-        self.__pitch = key
-        self.__velocity = velocity
-        self.__onsetTime = onsetTime
-        self.__onsetTick = onsetTick
-        self.__correctVoice = correctVoice
-        self.__offsetTime = 0
-        self.__offsetTick = 0
-        self.__guessedVoice = guessedVoice
+    __slots__ = ('__table', '__index')
+
+    def __init__(self, key, velocity, onsetTime, onsetTick, correctVoice, guessedVoice, table):
+        self.__table = table    # The NoteTable holding this note.
+        self.__index = table.addRow(key, velocity, onsetTime, onsetTick, correctVoice,
+                                    guessedVoice)   # The row of this note in its table.
+
+    # /**
+    #  * Get views of existing rows of the given table. Only one view should be made for each row, as
+    #  * notes are compared by identity.
+    #  *
+    #  * @param table The NoteTable.
+    #  * @param start The index of the first row.
+    #  * @param end The index just after the last row.
+    #  * @return A List of MidiNotes, one for each row from start to end.
+    #  */
+
+    @staticmethod
+    def getViews(table, start, end):
+        notes = []
+        for index in range(start, end):
+            note = MidiNote.__new__(MidiNote)
+            note.__table = table
+            note.__index = index
+            notes.append(note)
+        return notes
+
+    def getIndex(self):
+        return self.__index
 
     def setOffset(self, offsetTime, offsetTick):
-        self.__offsetTime = offsetTime
-        self.__offsetTick = offsetTick
+        self.__table.offsetTime[self.__index] = offsetTime
+        self.__table.offsetTick[self.__index] = offsetTick
+
+    def setTimes(self, onsetTime, offsetTime):
+        self.__table.onsetTime[self.__index] = onsetTime
+        self.__table.offsetTime[self.__index] = offsetTime
 
     def isActive(self):
-        return self.__offsetTime == 0
+        return self.getOffsetTime() == 0
 
     def close(self, offsetTime, offsetTick):
         self.setOffset(offsetTime, offsetTick)
@@ -32,54 +58,57 @@ class MidiNote:
     def overlaps(self, other):
         if other is None:
             return False
-        if self.__pitch == other.__pitch:
-            if self.__onsetTick < other.__offsetTick and self.__offsetTick > other.__onsetTick:
+        if self.getPitch() == other.getPitch():
+            if self.getOnsetTick() < other.getOffsetTick() and self.getOffsetTick() > other.getOnsetTick():
                 return True
-            elif other.__onsetTick < self.__onsetTick and other.__offsetTick > self.__offsetTick:
+            elif other.getOnsetTick() < self.getOnsetTick() and other.getOffsetTick() > self.getOffsetTick():
                 return True
         return False
 
     def getOnsetTime(self):
-        return self.__onsetTime
+        return self.__table.onsetTime[self.__index]
 
     def getOnsetTick(self):
-        return self.__onsetTick
+        return self.__table.onsetTick[self.__index]
 
     def getOffsetTime(self):
-        return self.__offsetTime
+        return self.__table.offsetTime[self.__index]
 
     def getOffsetTick(self):
-        return self.__offsetTick
+        return self.__table.offsetTick[self.__index]
 
     def getDurationTime(self):
-        return self.__offsetTime - self.__onsetTime
+        return self.getOffsetTime() - self.getOnsetTime()
 
     def getPitch(self):
-        return self.__pitch
+        return self.__table.pitch[self.__index]
 
     def getVelocity(self):
-        return self.__velocity
+        return self.__table.velocity[self.__index]
 
     def get_correct_voice(self):
-        return self.__correctVoice
+        return self.__table.correctVoice[self.__index]
 
     def set_correct_voice(self, correctVoice):
-        self.__correctVoice = correctVoice
+        self.__table.correctVoice[self.__index] = correctVoice
 
     def set_guessed_voice(self, voice):
-        self.__guessedVoice = voice
+        self.__table.guessedVoice[self.__index] = voice
 
     def get_guessed_voice(self):
-        return self.__guessedVoice
+        return self.__table.guessedVoice[self.__index]
 
     def __str__(self):
         # return 's'
-        return "(K:{0:d}  V:{1:d}  [{2:d}-{3:d}] {4:d})".format(self.__pitch, self.__velocity, self.__onsetTick,
-                                                                self.__offsetTick, self.__correctVoice)
+        return "(K:{0:d}  V:{1:d}  [{2:d}-{3:d}] {4:d})".format(self.getPitch(), self.getVelocity(), self.getOnsetTick(),
+                                                                self.getOffsetTick(), self.get_correct_voice())
 
+    # Ordered as NoteTable.SORT_KEYS
     def __lt__(self, other):
-        return (self.__onsetTick, self.__offsetTick, self.__pitch, self.__velocity, self.__correctVoice,
-                self.__guessedVoice) < (
-               other.__onsetTick, other.__offsetTick, other.__pitch, other.__velocity, other.__correctVoice,
-               other.__guessedVoice)
+        return self.__getSortKey() < other.__getSortKey()
 
+    def __getSortKey(self):
+        table = self.__table
+        index = self.__index
+        return (table.onsetTick[index], table.offsetTick[index], table.pitch[index], table.velocity[index],
+                table.correctVoice[index], table.guessedVoice[index])
@@ -42,7 +42,7 @@ class MidiWriter:
             if node.getTimeSignature() != prev.getTimeSignature():
                 self.writeTimeSignature(node.getTimeSignature(), tick)
 
-            if node.getTempo() != prev.getTemp():
+            if node.getTempo() != prev.getTempo():
                 self.writeTempo(node.getTempo(), tick)
             i += 1
 
@@ -5,3 +5,19 @@ class NoteEventParser:
 
     def noteOff(self, key, tick, channel):
         pass
+
+    # /**
+    #  * Called once every event of a file has been parsed.
+    #  */
+
+    def finish(self):
+        pass
+
+    # /**
+    #  * Get the {@link NoteTable} the notes of this parser are rows of, if there is one.
+    #  *
+    #  * @return The NoteTable, or None if notes are not kept in a table.
+    #  */
+
+    def getNoteTable(self):
+        pass
@@ -1,51 +1,80 @@
+from collections import deque
+
+import numpy as np
+
 from noteeventparser import NoteEventParser
 from midinote import MidiNote
+from notetable import NoteTable
 
 class NoteListGenerator(NoteEventParser):
     def __init__(self, timeTracker):
-        self.__activeNotes = []
+        self.__activeNotes = None
         self.__completedNotes = []
         self.timeTracker = None
 
-        self.__activeNotes = []
+        self.__activeNotes = {}     # (pitch, channel) -> deque of the notes not yet finished, oldest first.
         self.__completedNotes = []
+        self.__sorted = True        # True if the completed notes are known to be sorted.
+        self.__table = NoteTable()  # The NoteTable holding every note of this generator.
+        self.__untimedNotes = []    # The notes whose times have not been computed yet, in row order.
 
         self.timeTracker = timeTracker
 
+    # Note times are only computed from the ticks in finish(), all at once
     def noteOn(self, key, velocity, tick, channel):
-        time = self.timeTracker.getTimeAtTick(tick)
-        note = MidiNote(key, velocity, time, tick, channel, -1)
-        self.__activeNotes.append(note)
+        note = MidiNote(key, velocity, 0, tick, channel, -1, self.__table)
+        self.__untimedNotes.append(note)
+        self.__activeNotes.setdefault((key, channel), deque()).append(note)
         return note
 
+    # A re-struck pitch is closed first in, first out
     def noteOff(self, key, tick, channel):
-        time = self.timeTracker.getTimeAtTick(tick)
-        for note in self.__activeNotes:
-            if note.getPitch() == key and note.get_correct_voice() == channel:
-                self.__activeNotes.pop()
-                note.close(time, tick)
-                self.__completedNotes.append(note)
-                return
+        notes = self.__activeNotes.get((key, channel))
+        if notes:
+            note = notes.popleft()
+            note.close(0, tick)
+            self.__completedNotes.append(note)
+            self.__sorted = False
+
+    # /**
+    #  * Add a note which is already closed and timed. It must be a row of {@link #getNoteTable()}.
+    #  *
+    #  * @param note The note.
+    #  */
+
+    def addCompletedNote(self, note):
+        self.__completedNotes.append(note)
+        self.__sorted = False
+
+    def getNoteTable(self):
+        return self.__table
+
+    def finish(self):
+        notes = self.__untimedNotes
+        if not notes:
+            return
+        rows = np.fromiter((note.getIndex() for note in notes), dtype=np.int64, count=len(notes))
+        onsetTimes = self.timeTracker.getTimesAtTicks(self.__table.getValues('onsetTick', rows)).tolist()
+        offsetTimes = self.timeTracker.getTimesAtTicks(self.__table.getValues('offsetTick', rows)).tolist()
+        for note, onsetTime, offsetTime in zip(notes, onsetTimes, offsetTimes):
+            note.setTimes(onsetTime, offsetTime)
+        self.__untimedNotes = []
 
     def getNoteList(self):
-        self.__completedNotes.sort()
+        self.finish()
+        if not self.__sorted:
+            indices = np.fromiter((note.getIndex() for note in self.__completedNotes), dtype=np.int64,
+                                  count=len(self.__completedNotes))
+            order = self.__table.getSortOrder(indices).tolist()
+            self.__completedNotes = [self.__completedNotes[i] for i in order]
+            self.__sorted = True
         return self.__completedNotes
 
+    # Each onset's notes keep their note list order, so runs are repeatable
     def getIncomingLists(self):
-        incomingLists = []
         noteList = self.getNoteList()
-
-        i = 0
-        while i < len(noteList):
-            incoming = set([])
-            mm = []
-            onsetTime = noteList[i].getOnsetTime()
-            condition = True
-            while condition:
-                incoming.add(noteList[i])
-                i += 1
-                condition = i < len(noteList) and noteList[i].getOnsetTime() == onsetTime
-            for t in incoming:
-                mm.append(t)
-            incomingLists.append(mm)
-        return incomingLists
+        if not noteList:
+            return []
+        indices = np.fromiter((note.getIndex() for note in noteList), dtype=np.int64, count=len(noteList))
+        bounds = [0] + self.__table.getOnsetBoundaries(indices).tolist() + [len(noteList)]
+        return [noteList[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
@@ -0,0 +1,116 @@
+# /**
+#  * A <code>NoteTable</code> stores notes column by column: one array each for the pitch, velocity, onset and
+#  * offset tick and time, and correct and guessed voice of every note. Each {@link MidiNote} is a view of one
+#  * row, and holds nothing but its table and row index.
+#  * <p>
+#  * Columns are Python int64 arrays, so reading a single field returns a Python int without going through
+#  * NumPy, and appending a row is amortized constant time. Sorting and grouping whole note lists is done on
+#  * NumPy views of the columns, see {@link #getSortOrder(np.ndarray)} and {@link #getOnsetBoundaries(np.ndarray)}.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+from array import array
+
+import numpy as np
+
+
+class NoteTable:
+
+    COLUMNS = ('pitch', 'velocity', 'onsetTime', 'onsetTick', 'offsetTime', 'offsetTick', 'correctVoice',
+               'guessedVoice')    # The names of the columns.
+    SORT_KEYS = ('onsetTick', 'offsetTick', 'pitch', 'velocity', 'correctVoice',
+                 'guessedVoice')  # The columns MidiNotes are ordered by, most significant first.
+
+    def __init__(self):
+        # The columns are public so that MidiNote views can read them directly.
+        self.pitch = array('q')
+        self.velocity = array('q')
+        self.onsetTime = array('q')
+        self.onsetTick = array('q')
+        self.offsetTime = array('q')
+        self.offsetTick = array('q')
+        self.correctVoice = array('q')
+        self.guessedVoice = array('q')
+
+    # /**
+    #  * Append a row for a new note, with no offset yet.
+    #  *
+    #  * @return The index of the new row.
+    #  */
+
+    def addRow(self, pitch, velocity, onsetTime, onsetTick, correctVoice, guessedVoice):
+        self.pitch.append(pitch)
+        self.velocity.append(velocity)
+        self.onsetTime.append(onsetTime)
+        self.onsetTick.append(onsetTick)
+        self.offsetTime.append(0)
+        self.offsetTick.append(0)
+        self.correctVoice.append(correctVoice)
+        self.guessedVoice.append(guessedVoice)
+        return len(self.pitch) - 1
+
+    # /**
+    #  * Append many rows at once.
+    #  *
+    #  * @param columns A dict from column name to an array of values. Missing columns are filled with 0.
+    #  * @return The index of the first new row.
+    #  */
+
+    def addRows(self, columns):
+        start = len(self.pitch)
+        count = len(next(iter(columns.values())))
+        for name in self.COLUMNS:
+            values = columns[name] if name in columns else np.zeros(count)
+            getattr(self, name).frombytes(np.asarray(values, dtype=np.int64).tobytes())
+        return start
+
+    # /**
+    #  * Get the values of a column at the given rows.
+    #  *
+    #  * @param name The name of the column, one of {@link #COLUMNS}.
+    #  * @param indices An array of row indices.
+    #  * @return A new NumPy int64 array of the values.
+    #  */
+
+    def getValues(self, name, indices):
+        # The view is dropped as soon as it is indexed, since a column cannot grow while it is exported
+        return np.frombuffer(getattr(self, name), dtype=np.int64)[indices]
+
+    # /**
+    #  * Get the order of the given rows by {@link #SORT_KEYS}, as for {@link MidiNote#__lt__}. The sort is
+    #  * stable.
+    #  *
+    #  * @param indices An array of row indices.
+    #  * @return An array of positions into indices, giving its sorted order.
+    #  */
+
+    def getSortOrder(self, indices):
+        # np.lexsort sorts by its last key first
+        return np.lexsort(tuple(self.getValues(name, indices) for name in reversed(self.SORT_KEYS)))
+
+    # /**
+    #  * Sort notes which are rows of this table, as {@link MidiNote#__lt__} would.
+    #  *
+    #  * @param notes A List of MidiNotes of this table.
+    #  * @return A new List of the notes, sorted.
+    #  */
+
+    def sortNotes(self, notes):
+        indices = np.fromiter((note.getIndex() for note in notes), dtype=np.int64, count=len(notes))
+        return [notes[i] for i in self.getSortOrder(indices).tolist()]
+
+    # /**
+    #  * Get where the onset time changes in the given rows.
+    #  *
+    #  * @param indices An array of row indices, in onset order.
+    #  * @return An array of the positions in indices at which a new onset time starts, the first excluded.
+    #  */
+
+    def getOnsetBoundaries(self, indices):
+        return np.flatnonzero(np.diff(self.getValues('onsetTime', indices))) + 1
+
+    def __len__(self):
+        return len(self.pitch)
@@ -0,0 +1,237 @@
+# /**
+#  * An <code>OnlineVoiceSplitter</code> runs an {@link HmmVoiceSplittingModel} on a stream of notes as they
+#  * arrive, rather than on the full note list of a parsed file.
+#  * <p>
+#  * It is a {@link NoteEventParser}, so it can be fed note on and note off events directly, for instance by an
+#  * {@link EventParser} or from live MIDI input. Events must arrive in time order. Whole onsets of already
+#  * finished notes can also be given to {@link #addOnset(list)}. An onset is handed to the model once it is
+#  * complete (a later onset has started) and all of its notes have finished, since the model needs their
+#  * durations. A held note cannot block the stream for more than {@link #lag} microseconds, though: once the
+#  * latest event is that far past the onset, any of its notes still sounding get a provisional offset at the
+#  * latest event time, and the onset is handed over anyway. Their real offsets are recorded when they arrive.
+#  * <p>
+#  * Voice assignments are committed with a fixed lag: once a note's onset is at least {@link #lag} microseconds
+#  * behind the newest onset handled by the model, it is assigned the voice it has in the best hypothesis.
+#  * Hypotheses which disagree with a committed assignment are then dropped, so later commits never contradict
+#  * earlier ones. Committed notes are labelled with a voice number which is stable for the whole stream: a note
+#  * takes the number of the note before it in its voice, or a new number if it starts a voice. After each
+#  * commit, the voice history all hypotheses share is pruned (see
+#  * {@link HmmVoiceSplittingModel#pruneCommonPrefix()}), so memory does not grow with the length of the stream.
+#  * Notes take their rows from a shared {@link NoteTable} of {@link #TABLE_CAPACITY} rows, which is replaced by a
+#  * new one when full, so a table is freed once all of its notes are.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import math
+from collections import deque
+
+from hmmvoicesplittingmodel import HmmVoiceSplittingModel
+from midinote import MidiNote
+from noteeventparser import NoteEventParser
+from notetable import NoteTable
+from timetracker import TimeTracker
+
+
+class OnlineVoiceSplitter(NoteEventParser):
+
+    LAG_DEFAULT = 2000000   # The default lag, in microseconds.
+    TABLE_CAPACITY = 4096   # The number of rows of each NoteTable notes are taken from.
+
+    def __init__(self, params, timeTracker=None, lag=LAG_DEFAULT):
+        self.__model = HmmVoiceSplittingModel(params)   # The model the onsets are handed to.
+        self.__timeTracker = TimeTracker() if timeTracker is None else timeTracker
+        self.__lag = lag                                # Notes this far behind the newest onset are committed.
+        self.__activeNotes = {}                         # (pitch, channel) -> deque of the notes not yet finished.
+        self.__openNotes = set()                        # The ids of the notes not yet finished.
+        self.__pendingOnsets = deque()                  # [onset time, notes, complete] not yet handled, in order.
+        self.__newestOnset = None                       # The onset time of the newest onset handled.
+        self.__lastTime = 0                             # The latest time of any event seen.
+        self.__lastTick = 0                             # The latest tick of any event seen.
+        self.__labels = {}                              # id(note) -> voice number, for every committed note.
+        self.__numLabels = 0                            # The number of voice numbers used so far.
+        self.__committed = []                           # (note, voice number) pairs not yet polled.
+        self.__table = NoteTable()                      # The NoteTable new notes take their rows from.
+
+    def noteOn(self, key, velocity, tick, channel):
+        time = self.__timeTracker.getTimeAtTick(tick)
+        if len(self.__table) == self.TABLE_CAPACITY:
+            self.__table = NoteTable()
+        note = MidiNote(key, velocity, time, tick, channel, -1, self.__table)
+        self.__activeNotes.setdefault((key, channel), deque()).append(note)
+        self.__openNotes.add(id(note))
+        self.__addToOnset(note, time)
+        self.__process()
+        return note
+
+    def noteOff(self, key, tick, channel):
+        notes = self.__activeNotes.get((key, channel))
+        if not notes:
+            return
+        time = self.__timeTracker.getTimeAtTick(tick)
+        note = notes.popleft()
+        note.close(time, tick)
+        self.__openNotes.discard(id(note))
+        self.__lastTime = max(self.__lastTime, time)
+        self.__lastTick = max(self.__lastTick, tick)
+        self.__process()
+
+    # /**
+    #  * Add a whole onset of notes, which must all have the same onset time and already be closed.
+    #  *
+    #  * @param notes The notes of the onset.
+    #  */
+
+    def addOnset(self, notes):
+        time = notes[0].getOnsetTime()
+        for note in notes:
+            self.__addToOnset(note, time)
+        self.__pendingOnsets[-1][2] = True
+        self.__process()
+
+    # /**
+    #  * End the stream. Any notes still sounding are closed at the time of the latest event, every remaining
+    #  * onset is handed to the model, and every note is committed.
+    #  */
+
+    def flush(self):
+        for notes in self.__activeNotes.values():
+            while notes:
+                note = notes.popleft()
+                note.close(self.__lastTime, self.__lastTick)
+                self.__openNotes.discard(id(note))
+        if self.__pendingOnsets:
+            self.__pendingOnsets[-1][2] = True
+        self.__process()
+        self.__commit(math.inf)
+
+    # /**
+    #  * Get the voice assignments committed since the last call.
+    #  *
+    #  * @return A List of (note, voice number) pairs, in order of commitment.
+    #  */
+
+    def poll(self):
+        committed = self.__committed
+        self.__committed = []
+        return committed
+
+    def getModel(self):
+        return self.__model
+
+    def __addToOnset(self, note, time):
+        if self.__newestOnset is not None and time <= self.__newestOnset:
+            raise ValueError("Note onset " + str(time) + " is not after the newest handled onset " +
+                             str(self.__newestOnset))
+        self.__lastTime = max(self.__lastTime, note.getOffsetTime(), time)
+        self.__lastTick = max(self.__lastTick, note.getOffsetTick(), note.getOnsetTick())
+        if self.__pendingOnsets and self.__pendingOnsets[-1][0] == time:
+            self.__pendingOnsets[-1][1].append(note)
+        elif self.__pendingOnsets and self.__pendingOnsets[-1][0] > time:
+            raise ValueError("Note onset " + str(time) + " arrived out of order")
+        else:
+            # A later onset has started, so the previous one is complete
+            if self.__pendingOnsets:
+                self.__pendingOnsets[-1][2] = True
+            self.__pendingOnsets.append([time, [note], False])
+
+    # /**
+    #  * Hand every ready onset to the model, in order, and commit the notes which have fallen behind. Notes
+    #  * still sounding more than {@link #lag} after their onset are given a provisional offset.
+    #  */
+
+    def __process(self):
+        handled = False
+        while self.__pendingOnsets and self.__pendingOnsets[0][2]:
+            time, notes, complete = self.__pendingOnsets[0]
+            openNotes = [note for note in notes if id(note) in self.__openNotes]
+            if openNotes:
+                if self.__lastTime - time < self.__lag:
+                    break
+                for note in openNotes:
+                    # It stays active, so its real offset is still set by its note off
+                    note.setOffset(self.__lastTime, self.__lastTick)
+                    self.__openNotes.discard(id(note))
+            self.__pendingOnsets.popleft()
+            self.__model.handle_incoming(notes)
+            self.__newestOnset = time
+            handled = True
+        if handled:
+            self.__commit(self.__newestOnset - self.__lag)
+
+    # /**
+    #  * Commit every note of the best hypothesis whose onset is at or before the given horizon, and drop the
+    #  * hypotheses which disagree with it.
+    #  *
+    #  * @param horizon The latest onset time to commit.
+    #  */
+
+    def __commit(self, horizon):
+        hypotheses = self.__model.get_hypotheses()
+        if not hypotheses:
+            return
+        best = self.__getPredecessors(hypotheses[0], horizon)
+
+        # Keep only the hypotheses which agree with what is about to be committed
+        consistent = [hypotheses[0]]
+        for state in hypotheses[1:]:
+            predecessors = self.__getPredecessors(state, horizon, best)
+            if all(noteId in predecessors and predecessors[noteId][1] is prev
+                   for noteId, (note, prev) in best.items()):
+                consistent.append(state)
+        self.__model.set_hypotheses(consistent)
+
+        for note, prev in sorted(best.values(), key=lambda pair: pair[0].getOnsetTime()):
+            self.__label(note, prev)
+
+        # The history all hypotheses now share is final, so it is committed as well before being freed
+        for note, prev in self.__model.pruneCommonPrefix():
+            if id(note) not in self.__labels:
+                self.__label(note, prev)
+
+        # Forget the labels of notes which are no longer reachable
+        labels = {}
+        for state in consistent:
+            for voice in state.getVoices():
+                node = voice
+                while node is not None:
+                    noteId = id(node.get_most_recent_note())
+                    if noteId in self.__labels:
+                        labels[noteId] = self.__labels[noteId]
+                    node = node.get_previous()
+        self.__labels = labels
+
+    def __label(self, note, prev):
+        if prev is None:
+            label = self.__numLabels
+            self.__numLabels += 1
+        else:
+            label = self.__labels[id(prev)]
+        self.__labels[id(note)] = label
+        self.__committed.append((note, label))
+
+    # /**
+    #  * Get the uncommitted notes of the given state at or before the given horizon, with their predecessors.
+    #  *
+    #  * @param state The state whose voices to read.
+    #  * @param horizon The latest onset time to include.
+    #  * @param include If given, also include any note whose id is in it, whatever its onset time. This
+    #  *        lets the other hypotheses be checked against the best one.
+    #  * @return A dict of id(note) -> (note, the note before it in its voice or None).
+    #  */
+
+    def __getPredecessors(self, state, horizon, include=None):
+        predecessors = {}
+        for voice in state.getVoices():
+            node = voice
+            while node is not None:
+                note = node.get_most_recent_note()
+                if id(note) in self.__labels:
+                    break
+                prev = node.get_previous()
+                if note.getOnsetTime() <= horizon or (include is not None and id(note) in include):
+                    predecessors[id(note)] = (note, None if prev is None else prev.get_most_recent_note())
+                node = prev
+        return predecessors
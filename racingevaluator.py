@@ -0,0 +1,189 @@
+# /**
+#  * A <code>RacingEvaluator</code> evaluates parameter sets on a corpus by racing them: every surviving
+#  * candidate is run on the next batch of songs, and candidates which can no longer beat the leader are
+#  * dropped before they see the rest of the corpus.
+#  * <p>
+#  * {@link HmmVoiceSplittingModelTester#tune(int, SearchStrategy)} picks the best parameters by the F1 of their
+#  * mean precision and mean recall, which rises with each of them. So a candidate whose mean precision and mean
+#  * recall over the whole corpus are both below those of the leader can never be picked. The candidate is
+#  * compared with the leader song by song, over the n songs both have been run on: it is dropped once Hoeffding
+#  * upper bounds on both its mean precision difference and its mean recall difference to the leader are below
+#  * 0, with confidence 1 - {@link #delta}. Per-song precision and recall lie in [0, 1], so each difference lies
+#  * in [-1, 1], and each bound is <code>mean + sqrt(2 ln(2 / delta) / n)</code> (delta is split between the
+#  * two). Pairing the candidates song by song removes the (large) differences between songs from the
+#  * comparison. A candidate which trades precision for recall against the leader is never dropped.
+#  * <p>
+#  * The leader is whichever of the surviving candidates and the best fully evaluated candidate so far (the
+#  * incumbent) has the highest F1 over the songs run so far. The incumbent is kept across races, and can be
+#  * offered from elsewhere, such as a {@link ResultStore}, so that it is not run again. Songs are raced in a
+#  * fixed random order, so that each prefix is a fair sample of the corpus. The bounds only start to drop
+#  * candidates once n is in the tens of songs, so racing pays off on full corpora rather than on a handful of
+#  * files.
+#  * <p>
+#  * The songs of every race are run on a single pool of worker processes, started by the first race which
+#  * needs it and stopped by {@link #close()}.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import math
+import random
+
+
+class RacingEvaluator:
+
+    DELTA_DEFAULT = 0.05    # The default probability of wrongly dropping a candidate, per comparison.
+    BATCH_SIZE_DEFAULT = 5  # The default number of songs run between two comparisons.
+
+    # /**
+    #  * Create a new RacingEvaluator.
+    #  *
+    #  * @param tester The {@link HmmVoiceSplittingModelTester} holding the songs, which runs and scores them.
+    #  * @param delta The probability of wrongly dropping a candidate, per comparison.
+    #  * @param batchSize The number of songs run between two comparisons.
+    #  * @param seed The seed of the random order of the songs.
+    #  */
+
+    def __init__(self, tester, delta=DELTA_DEFAULT, batchSize=BATCH_SIZE_DEFAULT, seed=0):
+        self.__tester = tester                  # The tester which runs and scores songs.
+        self.__delta = delta                    # The probability of wrongly dropping a candidate.
+        self.__batchSize = max(1, batchSize)    # The number of songs run between two comparisons.
+        self.__order = list(range(len(tester.songs)))   # The order in which songs are run.
+        random.Random(seed).shuffle(self.__order)
+        self.__incumbent = None                 # The song scores of the best fully evaluated candidate, in order.
+        self.__pool = None                      # The pool of worker processes of every race, or None.
+
+    # /**
+    #  * Race the given parameter sets.
+    #  *
+    #  * @param paramList A List of the {@link HmmVoiceSplittingModelParameters} to evaluate.
+    #  * @return An iterator over the {@link HmmVoiceSplittingModelTesterReturn} of each parameter set, in the
+    #  *         order they finish. Those of dropped candidates are averaged over the songs they were run on, and
+    #  *         are marked with {@link HmmVoiceSplittingModelTesterReturn#setAbandoned(int)}.
+    #  */
+
+    def race(self, paramList):
+        # Each candidate is [params, List of song scores in race order, seconds]
+        alive = [[params, [], 0] for params in paramList]
+        position = 0
+        while alive and position < len(self.__order):
+            songs = self.__order[position:position + self.__batchSize]
+            tasks = [(candidate[0], songIndex) for candidate in alive for songIndex in songs]
+            for taskIndex, songReturn in enumerate(self.__tester.evaluateTasks(tasks, self.__getPool())):
+                songIndex = tasks[taskIndex][1]
+                candidate = alive[taskIndex // len(songs)]
+                candidate[1].append((0, 0, 0) if songReturn is None else
+                                    self.__tester.scoreSong(songIndex, songReturn))
+                candidate[2] += 0 if songReturn is None else songReturn.getSeconds()
+            position += len(songs)
+
+            if position == len(self.__order):
+                break
+            leader = self.__getLeader(alive, position)
+            survivors = []
+            for candidate in alive:
+                if candidate[1] is not leader and self.__isDominated(candidate[1], leader, position):
+                    result = self.__getTesterReturn(candidate[0], candidate[1], candidate[2])
+                    result.setAbandoned(position)
+                    yield result
+                else:
+                    survivors.append(candidate)
+            alive = survivors
+
+        for candidate in alive:
+            # Back in the order of the songs
+            scores = [None] * len(self.__order)
+            for index, songIndex in enumerate(self.__order):
+                scores[songIndex] = candidate[1][index]
+            result = self.__getTesterReturn(candidate[0], scores, candidate[2])
+            self.offer(result)
+            yield result
+
+    def __getTesterReturn(self, params, scores, seconds):
+        result = self.__tester.getTesterReturn(params, scores)
+        result.setSeconds(seconds)
+        return result
+
+    # /**
+    #  * Offer a result as the incumbent, which every later candidate is raced against. It becomes the incumbent
+    #  * if it has the scores of every song and a higher F1 than the current incumbent.
+    #  *
+    #  * @param result A {@link HmmVoiceSplittingModelTesterReturn}, for instance one read from a
+    #  *        {@link ResultStore}.
+    #  */
+
+    def offer(self, result):
+        songScores = result.getSongScores()
+        if result.isAbandoned() or songScores is None or len(songScores) != len(self.__order):
+            return
+        scores = [songScores[songIndex] for songIndex in self.__order]
+        if self.__incumbent is None or self.__getF1(scores, len(scores)) > \
+                self.__getF1(self.__incumbent, len(scores)):
+            self.__incumbent = scores
+
+    # /**
+    #  * Stop the pool of worker processes, if one was started. A later race starts a new one.
+    #  */
+
+    def close(self):
+        if self.__pool is not None:
+            self.__pool.terminate()
+            self.__pool.join()
+            self.__pool = None
+
+    def __getPool(self):
+        if self.__pool is None and self.__tester.NUM_PROCS > 1:
+            self.__pool = self.__tester.createPool()
+        return self.__pool
+
+    # /**
+    #  * Get the song scores of the leader.
+    #  *
+    #  * @param alive The surviving candidates.
+    #  * @param position The number of songs run so far.
+    #  * @return The song scores List with the highest F1 over the first position songs, among the alive
+    #  *         candidates and the incumbent.
+    #  */
+
+    def __getLeader(self, alive, position):
+        leader = self.__incumbent
+        for candidate in alive:
+            if leader is None or self.__getF1(candidate[1], position) > self.__getF1(leader, position):
+                leader = candidate[1]
+        return leader
+
+    # /**
+    #  * Decide whether a candidate is worse than the leader in both precision and recall, with confidence
+    #  * 1 - {@link #delta}.
+    #  *
+    #  * @param scores The song scores of the candidate.
+    #  * @param leader The song scores of the leader.
+    #  * @param position The number of songs to compare, which both have been run on.
+    #  * @return True if the Hoeffding upper bounds on the mean paired precision difference and the mean paired
+    #  *         recall difference of the candidate to the leader, over the first position songs, are both below 0.
+    #  */
+
+    def __isDominated(self, scores, leader, position):
+        slack = math.sqrt(2 * math.log(2 / self.__delta) / position)
+        precisionDifference = sum(scores[i][1] - leader[i][1] for i in range(position)) / float(position)
+        recallDifference = sum(scores[i][2] - leader[i][2] for i in range(position)) / float(position)
+        return max(precisionDifference, recallDifference) + slack < 0
+
+    # /**
+    #  * Get the F1 of the mean precision and mean recall of the first songs, as in
+    #  * {@link HmmVoiceSplittingModelTesterReturn#getF1()}.
+    #  *
+    #  * @param scores A List of (voice consistency, precision, recall) song scores.
+    #  * @param position The number of songs to average over.
+    #  * @return The F1, or 0 if the mean precision or the mean recall is 0.
+    #  */
+
+    @staticmethod
+    def __getF1(scores, position):
+        precision = sum(score[1] for score in scores[:position]) / float(position)
+        recall = sum(score[2] for score in scores[:position]) / float(position)
+        if precision == 0 or recall == 0:
+            return 0.0
+        return 2 * precision * recall / (precision + recall)
@@ -0,0 +1,149 @@
+# /**
+#  * A <code>ResultStore</code> keeps the results of tuning on disk, so that an interrupted sweep resumes where it
+#  * stopped, and parameter sets which an earlier experiment already evaluated are not evaluated again.
+#  * <p>
+#  * Results are appended to a JSON Lines file, one {@link HmmVoiceSplittingModelTesterReturn} per line, as soon
+#  * as they are known. A line holds the normalized parameters (see {@link #getKey(HmmVoiceSplittingModelParameters)}),
+#  * the fingerprint of the corpus they were evaluated on (see {@link #getCorpusFingerprint(list, bool)}),
+#  * {@link #VERSION}, the voice consistency, precision and recall, the total inference time, and the scores of
+#  * each song by its content hash, which a {@link RacingEvaluator} races later candidates against. Only the
+#  * lines of the current corpus and version are used. A line cut short by an interruption is ignored, so the
+#  * file never needs repairing. Results of abandoned races are not stored, since they depend on the other
+#  * candidates.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import hashlib
+import json
+import os
+
+from corpuscache import CorpusCache
+from hmmvoicesplittingmodelreturn import HmmVoiceSplittingModelTesterReturn
+
+
+class ResultStore:
+
+    VERSION = 1     # The version of the model and scoring code. Results of other versions are ignored.
+
+    # The fields of HmmVoiceSplittingModelParameters which affect results.
+    PARAMETERS = ('BEAM_SIZE', 'NEW_VOICE_PROBABILITY', 'PITCH_HISTORY_LENGTH', 'GAP_STD_MICROS', 'PITCH_STD',
+                  'MIN_GAP_SCORE', 'RECOMBINE', 'MAX_ONSET_EXPANSIONS', 'MAX_SONG_EXPANSIONS', 'MAX_ONSET_SECONDS',
+                  'MAX_SONG_SECONDS')
+
+    # /**
+    #  * Open the store in the given file, creating it if needed.
+    #  *
+    #  * @param path The path of the JSON Lines file.
+    #  * @param files A List of the paths of the MIDI files of the corpus being evaluated.
+    #  * @param useChannel True if channels are used as the correct voice, False for tracks.
+    #  */
+
+    def __init__(self, path, files, useChannel):
+        self.__path = path                  # The path of the JSON Lines file.
+        self.__songHashes = [CorpusCache.getContentHash(f) for f in files]     # The content hash of each song.
+        fingerprint = self.getCorpusFingerprint(self.__songHashes, useChannel)
+        self.__fingerprint = fingerprint    # The fingerprint of the corpus being evaluated.
+        self.__results = {}                 # Key -> the stored record of the corpus, see getKey.
+        self.__partialLine = False          # True if the file ends with a line cut short.
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    self.__partialLine = not line.endswith('\n')
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and record.get('corpus') == fingerprint and \
+                            record.get('version') == self.VERSION:
+                        self.__results[self.getKey(record['parameters'])] = record
+
+    # /**
+    #  * Get the stored result of the given parameters.
+    #  *
+    #  * @param params The {@link HmmVoiceSplittingModelParameters}.
+    #  * @return The {@link HmmVoiceSplittingModelTesterReturn} of the parameters on this corpus, or None if they
+    #  *         have not been evaluated.
+    #  */
+
+    def load(self, params):
+        record = self.__results.get(self.getKey(params))
+        if record is None:
+            return None
+        result = HmmVoiceSplittingModelTesterReturn()
+        result.set_fields(params, record['voiceConsistency'], record['precision'], record['recall'])
+        result.setSeconds(record['seconds'])
+        songs = record.get('songs')
+        if songs is not None and all(songHash in songs for songHash in self.__songHashes):
+            result.setSongScores([tuple(songs[songHash]) for songHash in self.__songHashes])
+        return result
+
+    # /**
+    #  * Append the given result to the store. Abandoned results are not stored.
+    #  *
+    #  * @param result The {@link HmmVoiceSplittingModelTesterReturn} to store.
+    #  */
+
+    def store(self, result):
+        if result.isAbandoned():
+            return
+        parameters = self.__getNormalizedParameters(result.getParameters())
+        songs = None
+        if result.getSongScores() is not None:
+            songs = dict(zip(self.__songHashes, result.getSongScores()))
+        record = {'corpus': self.__fingerprint, 'version': self.VERSION, 'parameters': parameters,
+                  'voiceConsistency': result.getVoiceConsistency(), 'precision': result.getPrecision(),
+                  'recall': result.getRecall(), 'seconds': result.getSeconds(), 'songs': songs}
+        # A single write of a whole line, so that an interrupted run leaves at most one partial line
+        with open(self.__path, 'a', encoding='utf-8') as file:
+            file.write(('\n' if self.__partialLine else '') + json.dumps(record) + '\n')
+        self.__partialLine = False
+        self.__results[self.getKey(parameters)] = record
+
+    def __len__(self):
+        return len(self.__results)
+
+    # /**
+    #  * Get the key of the given parameters. Numbers are compared as floats, so that for instance 1E-9 given as a
+    #  * Decimal on the command line and 1e-09 from a search strategy have the same key.
+    #  *
+    #  * @param params The {@link HmmVoiceSplittingModelParameters}, or a dict of their normalized values.
+    #  * @return A string which is equal for parameters which give equal results.
+    #  */
+
+    @classmethod
+    def getKey(cls, params):
+        if not isinstance(params, dict):
+            params = cls.__getNormalizedParameters(params)
+        return json.dumps([[name, params.get(name)] for name in cls.PARAMETERS])
+
+    @classmethod
+    def __getNormalizedParameters(cls, params):
+        parameters = {}
+        for name in cls.PARAMETERS:
+            value = getattr(params, name)
+            parameters[name] = value if isinstance(value, bool) else float(value)
+        return parameters
+
+    # /**
+    #  * Get the fingerprint of a corpus.
+    #  *
+    #  * @param songHashes A List of the content hashes of the MIDI files of the corpus, see
+    #  *        {@link CorpusCache#getContentHash(str)}.
+    #  * @param useChannel True if channels are used as the correct voice, False for tracks.
+    #  * @return The hexadecimal SHA-1 digest of the sorted content hashes of the files, the parser version and
+    #  *         useChannel. It does not depend on the names or order of the files.
+    #  */
+
+    @staticmethod
+    def getCorpusFingerprint(songHashes, useChannel):
+        digest = hashlib.sha1()
+        for contentHash in sorted(songHashes):
+            digest.update(contentHash.encode('ascii'))
+        digest.update(('v' + str(CorpusCache.PARSER_VERSION) + ('c' if useChannel else 't')).encode('ascii'))
+        return digest.hexdigest()
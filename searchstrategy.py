@@ -0,0 +1,469 @@
+# /**
+#  * A <code>SearchStrategy</code> decides which {@link HmmVoiceSplittingModelParameters} to evaluate next while
+#  * tuning, see {@link HmmVoiceSplittingModelTester#tune(int, SearchStrategy)}.
+#  * <p>
+#  * Strategies work in batches: {@link #getNextBatch()} proposes some parameter sets, the tester evaluates them
+#  * (in parallel, if it can), and hands each result back to {@link #observe(HmmVoiceSplittingModelTesterReturn)}.
+#  * Every strategy has a fixed budget of evaluations, and never proposes a parameter set it has already seen.
+#  * <p>
+#  * Three strategies are given here:
+#  * <ul>
+#  * <li>{@link GridSearch}, which evaluates a fixed list, such as the grid of the original tuning.</li>
+#  * <li>{@link CoordinateDescentSearch}, which line-searches one parameter at a time, narrowing the lines as it
+#  * stops improving.</li>
+#  * <li>{@link SurrogateSearch}, which fits a Gaussian process to the F1 scores seen so far and evaluates the
+#  * points of highest expected improvement, Bayesian optimization style.</li>
+#  * </ul>
+#  * The searched parameters and their ranges are given by a {@link ParameterSpace}.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import math
+
+import numpy as np
+
+from hmmvoicesplittingmodelparameters import HmmVoiceSplittingModelParameters
+
+
+class ParameterSpace:
+
+    # (name, minimum, maximum, log scale, integer) for each parameter, in the order of
+    # HmmVoiceSplittingModelParameters#set_fields. The beam size is not searched, see __init__.
+    DIMENSIONS = (('BEAM_SIZE', 1, 1, False, True),
+                  ('NEW_VOICE_PROBABILITY', 1E-10, 1E-6, True, False),
+                  ('PITCH_HISTORY_LENGTH', 1, 12, False, True),
+                  ('GAP_STD_MICROS', 10000, 1000000, True, False),
+                  ('PITCH_STD', 1, 12, False, False),
+                  ('MIN_GAP_SCORE', 1E-6, 1E-2, True, False))
+
+    SIGNIFICANT_DIGITS = 4  # Searched values which are not integers are rounded to this many significant digits.
+
+    # /**
+    #  * Create a new ParameterSpace around the given parameters.
+    #  *
+    #  * @param base The parameters to start searching from. Its beam size, which trades accuracy for speed
+    #  *        rather than being a property of the music, is kept fixed, as are its budget and RECOMBINE.
+    #  * @param dimensions The searched parameters, as in {@link #DIMENSIONS}. A parameter whose minimum and
+    #  *        maximum are equal is not searched.
+    #  */
+
+    def __init__(self, base, dimensions=None):
+        dimensions = list(self.DIMENSIONS if dimensions is None else dimensions)
+        if dimensions[0][0] == 'BEAM_SIZE':
+            dimensions[0] = ('BEAM_SIZE', base.BEAM_SIZE, base.BEAM_SIZE, False, True)
+        self.__base = base                  # The parameters the fixed values are taken from.
+        self.__dimensions = dimensions      # The parameters of the space, as in DIMENSIONS.
+        self.__free = [i for i, dimension in enumerate(dimensions)
+                       if dimension[1] != dimension[2]]   # The indices of the searched dimensions.
+
+    # /**
+    #  * Get the number of searched parameters.
+    #  *
+    #  * @return The number of dimensions of the unit cube points of this space.
+    #  */
+
+    def getNumDimensions(self):
+        return len(self.__free)
+
+    # /**
+    #  * Get the parameters at the given point of the unit cube.
+    #  *
+    #  * @param point A sequence of values between 0 and 1, one for each searched parameter.
+    #  * @return New {@link HmmVoiceSplittingModelParameters}, with the searched values rounded.
+    #  */
+
+    def getParameters(self, point):
+        values = [self.__getBaseValue(dimension[0]) for dimension in self.__dimensions]
+        for u, index in zip(point, self.__free):
+            name, low, high, log, integer = self.__dimensions[index]
+            u = min(max(float(u), 0.0), 1.0)
+            if log:
+                value = math.exp(math.log(low) + u * (math.log(high) - math.log(low)))
+            else:
+                value = low + u * (high - low)
+            if integer:
+                values[index] = int(round(value))
+            else:
+                values[index] = float('%.*g' % (self.SIGNIFICANT_DIGITS, value))
+
+        params = HmmVoiceSplittingModelParameters()
+        params.set_fields(*values)
+        params.set_budget(self.__base.MAX_ONSET_EXPANSIONS, self.__base.MAX_SONG_EXPANSIONS,
+                          self.__base.MAX_ONSET_SECONDS, self.__base.MAX_SONG_SECONDS)
+        params.RECOMBINE = self.__base.RECOMBINE
+        return params
+
+    # /**
+    #  * Get the point of the unit cube of the given parameters. Values outside of the space are clipped.
+    #  *
+    #  * @param params The parameters.
+    #  * @return A NumPy array with a value between 0 and 1 for each searched parameter.
+    #  */
+
+    def getPoint(self, params):
+        point = np.zeros(len(self.__free))
+        for i, index in enumerate(self.__free):
+            name, low, high, log, integer = self.__dimensions[index]
+            value = float(getattr(params, name))
+            if log:
+                u = (math.log(max(value, low)) - math.log(low)) / (math.log(high) - math.log(low))
+            else:
+                u = (value - low) / (high - low)
+            point[i] = min(max(u, 0.0), 1.0)
+        return point
+
+    def getBase(self):
+        return self.__base
+
+    def __getBaseValue(self, name):
+        return getattr(self.__base, name)
+
+
+class SearchStrategy:
+
+    def _initialize_instance_fields(self):
+        self.__space = None             # The ParameterSpace being searched.
+        self.__maxEvaluations = 0       # The number of evaluations this strategy may ask for.
+        self.__numProposed = 0          # The number of parameter sets proposed so far.
+        self.__results = {}             # HmmVoiceSplittingModelParameters -> the F1 it scored, once observed.
+        self.__proposed = set()         # The parameter sets proposed so far.
+        self.__best = None              # The HmmVoiceSplittingModelTesterReturn with the highest F1 observed.
+
+    def __init__(self, space, maxEvaluations):
+        self._initialize_instance_fields()
+        self.__space = space
+        self.__maxEvaluations = maxEvaluations
+
+    # /**
+    #  * Get the next parameter sets to evaluate.
+    #  *
+    #  * @return A List of {@link HmmVoiceSplittingModelParameters} which have not been proposed before. It is
+    #  *         empty once the budget is spent or the strategy has nothing left to try.
+    #  */
+
+    def getNextBatch(self):
+        remaining = self.__maxEvaluations - self.__numProposed
+        if remaining <= 0:
+            return []
+        batch = []
+        for params in self._propose(remaining) or []:
+            if params not in self.__proposed and len(batch) < remaining:
+                self.__proposed.add(params)
+                batch.append(params)
+        self.__numProposed += len(batch)
+        return batch
+
+    # /**
+    #  * Record the result of evaluating a proposed parameter set.
+    #  *
+    #  * @param result The {@link HmmVoiceSplittingModelTesterReturn} of the evaluation.
+    #  */
+
+    def observe(self, result):
+        self.__results[result.getParameters()] = result.getF1()
+        if self.__best is None or result.getF1() > self.__best.getF1():
+            self.__best = result
+
+    # /**
+    #  * Propose parameter sets to evaluate next. Subclasses implement this. Sets which were already proposed
+    #  * are filtered out by {@link #getNextBatch()}, so if every proposal has been seen, the strategy is done.
+    #  *
+    #  * @param maxSize The number of evaluations left in the budget.
+    #  * @return A List of {@link HmmVoiceSplittingModelParameters}, or None if there are none.
+    #  */
+
+    def _propose(self, maxSize):
+        pass
+
+    # /**
+    #  * Check whether the given parameters were proposed before.
+    #  *
+    #  * @param params The parameters.
+    #  * @return True if they were returned by an earlier {@link #getNextBatch()}.
+    #  */
+
+    def isProposed(self, params):
+        return params in self.__proposed
+
+    # /**
+    #  * Get the F1 of the given parameters, if they were evaluated.
+    #  *
+    #  * @param params The parameters.
+    #  * @return Their F1, or None if no result for them has been observed.
+    #  */
+
+    def getResult(self, params):
+        return self.__results.get(params)
+
+    def getResults(self):
+        return self.__results
+
+    def getBest(self):
+        return self.__best
+
+    def getSpace(self):
+        return self.__space
+
+    def getNumProposed(self):
+        return self.__numProposed
+
+
+class GridSearch(SearchStrategy):
+
+    # /**
+    #  * Create a new GridSearch over the given parameter sets, which are proposed all at once.
+    #  *
+    #  * @param paramList A List of the {@link HmmVoiceSplittingModelParameters} to evaluate.
+    #  * @param maxEvaluations The maximum number of them to evaluate. By default, all of them.
+    #  */
+
+    def __init__(self, paramList, maxEvaluations=None):
+        super().__init__(None, len(paramList) if maxEvaluations is None else maxEvaluations)
+        self.__paramList = paramList    # The parameter sets to evaluate.
+
+    def _propose(self, maxSize):
+        return self.__paramList
+
+
+class CoordinateDescentSearch(SearchStrategy):
+
+    MIN_SPAN = 1.0 / 64     # The search ends once the lines are shorter than this, in the unit cube.
+
+    # /**
+    #  * Create a new CoordinateDescentSearch. Each line search evaluates the given number of evenly spaced
+    #  * values of one parameter, with the others fixed at the best point found so far. The lines start out
+    #  * spanning the whole range, and are halved after each pass over all parameters which does not improve.
+    #  *
+    #  * @param space The {@link ParameterSpace} to search. The search starts at its base parameters.
+    #  * @param maxEvaluations The maximum number of evaluations.
+    #  * @param steps The number of values on each line.
+    #  */
+
+    def __init__(self, space, maxEvaluations, steps=5):
+        super().__init__(space, maxEvaluations)
+        self.__steps = max(2, steps)                        # The number of values on each line.
+        self.__point = space.getPoint(space.getBase())      # The best point found so far.
+        self.__span = 1.0                                   # The length of the lines of this pass.
+        self.__dimension = -1                               # The dimension of the current line.
+        self.__line = []                                    # The (value, params) of the current line.
+        self.__improved = False                             # True if this pass has moved the point.
+
+    def _propose(self, maxSize):
+        numDimensions = self.getSpace().getNumDimensions()
+        if numDimensions == 0:
+            return [self.getSpace().getParameters(self.__point)]
+
+        self.__finishLine()
+        while self.__span >= self.MIN_SPAN:
+            self.__dimension += 1
+            if self.__dimension == numDimensions:
+                # End of a pass
+                if not self.__improved:
+                    self.__span /= 2
+                self.__dimension = 0
+                self.__improved = False
+                if self.__span < self.MIN_SPAN:
+                    break
+
+            center = self.__point[self.__dimension]
+            low = min(max(center - self.__span / 2, 0.0), 1.0 - self.__span)
+            self.__line = []
+            for step in range(self.__steps):
+                point = self.__point.copy()
+                point[self.__dimension] = low + self.__span * step / (self.__steps - 1)
+                self.__line.append((point[self.__dimension], self.getSpace().getParameters(point)))
+            # The current point is always on the line, so the line search never moves away from it
+            self.__line.append((center, self.getSpace().getParameters(self.__point)))
+
+            batch = [params for value, params in self.__line if not self.isProposed(params)]
+            if batch:
+                return batch
+            self.__finishLine()
+        return []
+
+    # /**
+    #  * Move the current point to the best value of the current line.
+    #  */
+
+    def __finishLine(self):
+        best = None
+        bestF1 = None
+        for value, params in self.__line:
+            f1 = self.getResult(params)
+            if f1 is not None and (bestF1 is None or f1 > bestF1):
+                best = value
+                bestF1 = f1
+        if best is not None and best != self.__point[self.__dimension]:
+            currentF1 = self.getResult(self.getSpace().getParameters(self.__point))
+            if currentF1 is None or bestF1 > currentF1:
+                self.__point[self.__dimension] = best
+                self.__improved = True
+        self.__line = []
+
+
+class SurrogateSearch(SearchStrategy):
+
+    NUM_CANDIDATES = 2000                       # The number of random points scored by the surrogate each round.
+    NUM_LOCAL_CANDIDATES = 500                  # The number of points sampled around each of the best points.
+    LOCAL_STD = 0.05                            # The standard deviation of those samples, in the unit cube.
+    LENGTH_SCALES = (0.05, 0.1, 0.2, 0.4, 0.8)  # The kernel length scales tried when fitting.
+    NOISE = 1E-4                                # The noise variance of the normalized F1 scores.
+    JITTERS = (0.0, 1E-6, 1E-4, 1E-2, 1E-1)     # The extra noise variances tried when a fit fails.
+
+    # /**
+    #  * Create a new SurrogateSearch. It starts with a Latin hypercube sample of the space and its base
+    #  * parameters, and then repeatedly fits a Gaussian process to the F1 scores observed so far, and
+    #  * proposes the candidates of highest expected improvement.
+    #  *
+    #  * @param space The {@link ParameterSpace} to search.
+    #  * @param maxEvaluations The maximum number of evaluations.
+    #  * @param batchSize The number of parameter sets proposed at a time, for instance the number of
+    #  *        processes evaluating them. Within a batch, each chosen point is assumed to score the best F1 so
+    #  *        far (the "constant liar"), so the rest of the batch spreads out around it.
+    #  * @param seed The seed of the random number generator.
+    #  */
+
+    def __init__(self, space, maxEvaluations, batchSize=1, seed=0):
+        super().__init__(space, maxEvaluations)
+        self.__batchSize = max(1, batchSize)            # The number of parameter sets proposed at a time.
+        self.__random = np.random.default_rng(seed)     # The random number generator.
+        self.__numInitial = min(maxEvaluations, max(2 * space.getNumDimensions() + 1,
+                                                    maxEvaluations // 5))   # The size of the initial sample.
+
+    def _propose(self, maxSize):
+        space = self.getSpace()
+        if self.getNumProposed() == 0:
+            return self.__getInitialSample()
+
+        points = []
+        scores = []
+        for params, f1 in self.getResults().items():
+            points.append(space.getPoint(params))
+            scores.append(f1)
+        if not points:
+            return []
+        points = np.array(points)
+        scores = np.array(scores, dtype=float)
+        finite = np.isfinite(scores)
+        if not finite.any():
+            return self.__getInitialSample()
+        # Failed evaluations count as the worst score seen
+        scores[~finite] = scores[finite].min()
+
+        batch = []
+        for i in range(min(self.__batchSize, maxSize)):
+            params, point = self.__getBestCandidate(points, scores, batch)
+            if params is None:
+                break
+            batch.append(params)
+            points = np.vstack((points, point))
+            scores = np.append(scores, scores.max())
+        return batch
+
+    def __getInitialSample(self):
+        space = self.getSpace()
+        numDimensions = space.getNumDimensions()
+        sample = [space.getBase()]
+        # Latin hypercube: each dimension is split into numInitial strata, each used once
+        strata = np.array([self.__random.permutation(self.__numInitial) for d in range(numDimensions)]).T
+        for row in strata.reshape(self.__numInitial, numDimensions):
+            point = (row + self.__random.random(numDimensions)) / self.__numInitial
+            sample.append(space.getParameters(point))
+        return sample
+
+    # /**
+    #  * Find the candidate of highest expected improvement under a Gaussian process fitted to the given scores.
+    #  *
+    #  * @param points The observed points of the unit cube, one per row.
+    #  * @param scores The F1 of each point.
+    #  * @param batch Parameters already chosen for this batch, which are not chosen again.
+    #  * @return The chosen (parameters, point), or (None, None) if every candidate has been proposed before.
+    #  */
+
+    def __getBestCandidate(self, points, scores, batch):
+        space = self.getSpace()
+        numDimensions = space.getNumDimensions()
+
+        mean = scores.mean()
+        std = scores.std()
+        y = (scores - mean) / (std if std > 0 else 1.0)
+        fit = self.__fit(points, y)
+        if fit is None:
+            return self.__getRandomCandidate(batch)
+        lengthScale, cholesky, alpha = fit
+
+        candidates = [self.__random.random((self.NUM_CANDIDATES, numDimensions))]
+        for index in np.argsort(-y)[:5]:
+            local = points[index] + self.LOCAL_STD * self.__random.standard_normal((self.NUM_LOCAL_CANDIDATES,
+                                                                                    numDimensions))
+            candidates.append(np.clip(local, 0.0, 1.0))
+        candidates = np.vstack(candidates)
+
+        crossKernel = self.__kernel(candidates, points, lengthScale)
+        predictedMean = crossKernel @ alpha
+        v = np.linalg.solve(cholesky, crossKernel.T)
+        predictedStd = np.sqrt(np.maximum(1.0 - np.sum(v * v, axis=0), 1E-12))
+
+        # Expected improvement over the best score seen
+        improvement = predictedMean - y.max()
+        z = improvement / predictedStd
+        cdf = 0.5 * (1.0 + np.vectorize(math.erf)(z / math.sqrt(2.0)))
+        pdf = np.exp(-0.5 * z * z) / math.sqrt(2.0 * math.pi)
+        expectedImprovement = improvement * cdf + predictedStd * pdf
+
+        for index in np.argsort(-expectedImprovement):
+            params = space.getParameters(candidates[index])
+            if not self.isProposed(params) and params not in batch:
+                return params, space.getPoint(params)
+        return None, None
+
+    # /**
+    #  * Pick a random point of the space which has not been proposed.
+    #  *
+    #  * @param batch Parameters already chosen for this batch, which are not chosen again.
+    #  * @return The chosen (parameters, point), or (None, None) if none of {@link #NUM_CANDIDATES} random points
+    #  *         is new.
+    #  */
+
+    def __getRandomCandidate(self, batch):
+        space = self.getSpace()
+        for point in self.__random.random((self.NUM_CANDIDATES, space.getNumDimensions())):
+            params = space.getParameters(point)
+            if not self.isProposed(params) and params not in batch:
+                return params, space.getPoint(params)
+        return None, None
+
+    # /**
+    #  * Fit a Gaussian process with a squared exponential kernel, choosing the length scale from
+    #  * {@link #LENGTH_SCALES} by marginal likelihood. Duplicate or nearly duplicate points can make the kernel
+    #  * matrix singular, so if no length scale can be fitted, it is tried again with each of {@link #JITTERS}
+    #  * added to the noise.
+    #  *
+    #  * @return (length scale, Cholesky factor of the kernel matrix, kernel matrix inverse times y), or None if
+    #  *         no fit succeeded.
+    #  */
+
+    def __fit(self, points, y):
+        for jitter in self.JITTERS:
+            best = None
+            for lengthScale in self.LENGTH_SCALES:
+                kernel = self.__kernel(points, points, lengthScale) + (self.NOISE + jitter) * np.eye(len(points))
+                try:
+                    cholesky = np.linalg.cholesky(kernel)
+                except np.linalg.LinAlgError:
+                    continue
+                alpha = np.linalg.solve(cholesky.T, np.linalg.solve(cholesky, y))
+                logLikelihood = -0.5 * y @ alpha - np.sum(np.log(np.diag(cholesky)))
+                if best is None or logLikelihood > best[0]:
+                    best = (logLikelihood, lengthScale, cholesky, alpha)
+            if best is not None:
+                return best[1:]
+        return None
+
+    @staticmethod
+    def __kernel(a, b, lengthScale):
+        squaredDistances = np.sum(a * a, axis=1)[:, None] + np.sum(b * b, axis=1)[None, :] - 2 * a @ b.T
+        return np.exp(-0.5 * np.maximum(squaredDistances, 0.0) / (lengthScale * lengthScale))
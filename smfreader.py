@@ -0,0 +1,217 @@
+# /**
+#  * An <code>SmfReader</code> reads a Standard MIDI File straight from a memory map of it, without
+#  * building a mido message for every event.
+#  * <p>
+#  * Only the events the {@link EventParser} uses are produced: note on, note off, tempo, time signature,
+#  * key signature and end of track. The delta times of every other event are added to the next event
+#  * produced, so tick positions are unchanged. Events are {@link SmfEvent}s, which have the same attribute names as
+#  * mido messages, so either can be given to the EventParser. Tracks are decoded lazily, as they are
+#  * iterated over, but each track is checked when the file is opened, so decoding never fails.
+#  * <p>
+#  * Files this reader cannot handle (such as SMPTE time division, or a track which runs past its end) raise a
+#  * ValueError when they are opened, and can be read with mido instead. The file is then closed already;
+#  * otherwise, {@link #close()} must be called.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import mmap
+
+# The number of data bytes of each channel message, by the high nibble of its status byte.
+DATA_LENGTHS = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+
+# The key names of key signatures, by number of sharps (negative for flats) from -7 to 7, as in mido.
+MAJOR_KEYS = ('Cb', 'Gb', 'Db', 'Ab', 'Eb', 'Bb', 'F', 'C', 'G', 'D', 'A', 'E', 'B', 'F#', 'C#')
+MINOR_KEYS = ('Abm', 'Ebm', 'Bbm', 'Fm', 'Cm', 'Gm', 'Dm', 'Am', 'Em', 'Bm', 'F#m', 'C#m', 'G#m', 'D#m', 'A#m')
+
+
+class SmfEvent:
+
+    __slots__ = ('type', 'time', 'is_meta', 'channel', 'note', 'velocity', 'tempo', 'numerator', 'denominator',
+                 'clocks_per_click', 'notated_32nd_notes_per_beat', 'key')
+
+    def __init__(self, type, time, is_meta):
+        self.type = type            # The mido name of the event's type.
+        self.time = time            # The delta time of the event, in ticks.
+        self.is_meta = is_meta      # True for meta events.
+
+
+class SmfReader:
+
+    def __init__(self, midiFile):
+        with open(midiFile, 'rb') as file:
+            self.__buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)   # The mapped file.
+        self.tracks = []    # The SmfTracks of the file, in order.
+        self.ticks_per_beat = 0     # The pulses per quarter note of the file.
+        try:
+            self.__readChunks(midiFile)
+        except BaseException:
+            self.__buffer.close()
+            raise
+
+    def __readChunks(self, midiFile):
+        buffer = self.__buffer
+        if len(buffer) < 14 or buffer[0:4] != b'MThd':
+            raise ValueError(midiFile + " is not a Standard MIDI File")
+        headerLength = int.from_bytes(buffer[4:8], 'big')
+        division = int.from_bytes(buffer[12:14], 'big')
+        if division & 0x8000:
+            raise ValueError(midiFile + " uses SMPTE time division")
+        self.ticks_per_beat = division
+
+        position = 8 + headerLength
+        while position + 8 <= len(buffer):
+            length = int.from_bytes(buffer[position + 4:position + 8], 'big')
+            if buffer[position:position + 4] == b'MTrk':
+                track = SmfTrack(buffer, position + 8, min(position + 8 + length, len(buffer)))
+                if not track.isValid():
+                    raise ValueError(midiFile + " has a track which cannot be decoded")
+                self.tracks.append(track)
+            position += 8 + length
+
+    def close(self):
+        self.__buffer.close()
+
+
+class SmfTrack:
+
+    def __init__(self, buffer, start, end):
+        self.__buffer = buffer  # The mapped file.
+        self.__start = start    # The position of the first event of this track.
+        self.__end = end        # The position just after the last event of this track.
+
+    # /**
+    #  * Check that every event of this track can be decoded within its bounds, without decoding them.
+    #  *
+    #  * @return True if the track can be iterated over, False if an event runs past its end, or if it uses
+    #  *         running status before any status byte.
+    #  */
+
+    def isValid(self):
+        buffer = self.__buffer
+        position = self.__start
+        end = self.__end
+        status = 0
+        try:
+            while position < end:
+                position = self.__readLength(buffer, position)[0]
+                byte = buffer[position]
+                if byte & 0x80:
+                    position += 1
+                    if byte < 0xF0:
+                        status = byte
+                elif status == 0:
+                    return False
+                else:
+                    byte = status
+
+                if byte == 0xFF:
+                    metaType = buffer[position]
+                    position, length = self.__readLength(buffer, position + 1)
+                    position += length
+                    if metaType == 0x2F:
+                        break
+                elif byte == 0xF0 or byte == 0xF7:
+                    position, length = self.__readLength(buffer, position)
+                    position += length
+                else:
+                    position += DATA_LENGTHS.get(byte & 0xF0, 0)
+        except IndexError:
+            return False
+        return position <= end
+
+    # /**
+    #  * Decode the events of this track.
+    #  *
+    #  * @return A generator of the {@link SmfEvent}s of this track, in order.
+    #  */
+
+    def __iter__(self):
+        buffer = self.__buffer
+        position = self.__start
+        end = self.__end
+        status = 0
+        delta = 0
+        while position < end:
+            # Variable length delta time
+            byte = buffer[position]
+            position += 1
+            value = byte & 0x7F
+            while byte & 0x80:
+                byte = buffer[position]
+                position += 1
+                value = (value << 7) | (byte & 0x7F)
+            delta += value
+
+            byte = buffer[position]
+            if byte & 0x80:
+                position += 1
+                if byte < 0xF0:
+                    status = byte
+            elif status == 0:
+                raise ValueError("Running status without a previous status byte")
+            else:
+                # Running status: this byte is already data
+                byte = status
+
+            if byte == 0xFF:
+                metaType = buffer[position]
+                position, length = self.__readLength(buffer, position + 1)
+                data = buffer[position:position + length]
+                position += length
+                if metaType == 0x2F:
+                    yield SmfEvent('end_of_track', delta, True)
+                    return
+                event = self.__getMetaEvent(metaType, data, delta)
+            elif byte == 0xF0 or byte == 0xF7:
+                position, length = self.__readLength(buffer, position)
+                position += length
+                continue
+            else:
+                kind = byte & 0xF0
+                if kind == 0x90 or kind == 0x80:
+                    event = SmfEvent('note_on' if kind == 0x90 else 'note_off', delta, False)
+                    event.channel = byte & 0x0F
+                    event.note = buffer[position]
+                    event.velocity = buffer[position + 1]
+                else:
+                    event = None
+                position += DATA_LENGTHS.get(kind, 0)
+
+            if event is not None:
+                yield event
+                delta = 0
+
+    @staticmethod
+    def __readLength(buffer, position):
+        byte = buffer[position]
+        position += 1
+        value = byte & 0x7F
+        while byte & 0x80:
+            byte = buffer[position]
+            position += 1
+            value = (value << 7) | (byte & 0x7F)
+        return position, value
+
+    @staticmethod
+    def __getMetaEvent(metaType, data, delta):
+        if metaType == 0x51 and len(data) >= 3:
+            event = SmfEvent('set_tempo', delta, True)
+            event.tempo = int.from_bytes(data[0:3], 'big')
+        elif metaType == 0x58 and len(data) >= 4:
+            event = SmfEvent('time_signature', delta, True)
+            event.numerator = data[0]
+            event.denominator = 2 ** data[1]
+            event.clocks_per_click = data[2]
+            event.notated_32nd_notes_per_beat = data[3]
+        elif metaType == 0x59 and len(data) >= 2:
+            event = SmfEvent('key_signature', delta, True)
+            sharps = data[0] - 256 if data[0] > 127 else data[0]
+            if not -7 <= sharps <= 7:
+                return None
+            event.key = (MINOR_KEYS if data[1] == 1 else MAJOR_KEYS)[sharps + 7]
+        else:
+            return None
+        return event
@@ -0,0 +1,143 @@
+# /**
+#  * A <code>SyntheticMidiGenerator</code> writes random polyphonic MIDI files with a known voice for every note,
+#  * for benchmarking (see {@link Benchmark}).
+#  * <p>
+#  * Each voice is a random walk in its own register, written to its own track and channel, so either can be used
+#  * as the correct voice. Time runs on an eighth note grid. At each step where a voice is free, all voices attack
+#  * together with probability {@link #chordDensity}, cutting short any notes still sounding; otherwise, each free
+#  * voice starts a note or rests on its own. With probability {@link #crossingProbability} per step, the
+#  * registers of two adjacent voices are swapped, so the voices cross as they walk to their new registers.
+#  * {@link #numTempoChanges} tempo changes are spread evenly over the file.
+#  *
+#  * @author Santiago Martín Cortés
+#  * @version 1.0
+#  * @since 1.0
+#  */
+
+import random
+
+from mido import Message, MetaMessage, MidiFile, MidiTrack
+
+
+class SyntheticMidiGenerator:
+
+    MAX_VOICES = 16             # One channel per voice.
+    PPQ = 480                   # The pulses per quarter note of the files.
+    STEPS_PER_BEAT = 2          # The grid is in eighth notes.
+    DURATIONS = (1, 2, 2, 4)    # The note durations to pick from, in steps.
+    LOWEST_CENTER = 36          # The center pitch of the register of the lowest voice.
+    REGISTER_SPACING = 7        # The distance between the centers of adjacent registers, in semitones.
+    REGISTER_RANGE = 5          # How far a voice may walk from the center of its register.
+    MAX_LEAP = 3                # The largest interval between consecutive notes of a voice, within its register.
+    REST_PROBABILITY = 0.1      # The probability that a free voice rests for a step rather than starting a note.
+    VELOCITY = 80               # The velocity of every note.
+
+    def __init__(self, numVoices=4, chordDensity=0.3, crossingProbability=0.02, numTempoChanges=0, numBeats=128,
+                 seed=0):
+        if not 1 <= numVoices <= self.MAX_VOICES:
+            raise ValueError("The number of voices must be between 1 and " + str(self.MAX_VOICES))
+        self.numVoices = numVoices                      # The number of voices.
+        self.chordDensity = chordDensity                # The probability that free voices attack as a chord.
+        self.crossingProbability = crossingProbability  # The probability per step of a register swap.
+        self.numTempoChanges = numTempoChanges          # The number of tempo changes after the initial tempo.
+        self.numBeats = numBeats                        # The length of the files, in quarter notes.
+        self.seed = seed                                # The seed of the first file.
+
+    # /**
+    #  * Generate the notes of a file.
+    #  *
+    #  * @param seed The seed of the random number generator.
+    #  * @return A List of (voice, pitch, start step, end step) for each note.
+    #  */
+
+    def generateNotes(self, seed):
+        rng = random.Random(seed)
+        numSteps = self.numBeats * self.STEPS_PER_BEAT
+        centers = [self.LOWEST_CENTER + self.REGISTER_SPACING * voice for voice in range(self.numVoices)]
+        pitches = list(centers)
+        ends = [0] * self.numVoices             # The step at which the current note of each voice ends.
+        current = [None] * self.numVoices       # The index in notes of the current note of each voice.
+        notes = []
+
+        for step in range(numSteps):
+            if self.numVoices > 1 and rng.random() < self.crossingProbability:
+                voice = rng.randrange(self.numVoices - 1)
+                centers[voice], centers[voice + 1] = centers[voice + 1], centers[voice]
+
+            free = [voice for voice in range(self.numVoices) if ends[voice] <= step]
+            if not free:
+                continue
+            if rng.random() < self.chordDensity:
+                duration = min(rng.choice(self.DURATIONS), numSteps - step)
+                for voice in range(self.numVoices):
+                    if ends[voice] > step:
+                        # Cut the sounding note short
+                        notes[current[voice]][3] = step
+                    self.__startNote(rng, notes, voice, centers, pitches, step, step + duration)
+                    ends[voice] = step + duration
+                    current[voice] = len(notes) - 1
+            else:
+                for voice in free:
+                    if rng.random() < self.REST_PROBABILITY:
+                        ends[voice] = step + 1
+                        continue
+                    duration = min(rng.choice(self.DURATIONS), numSteps - step)
+                    self.__startNote(rng, notes, voice, centers, pitches, step, step + duration)
+                    ends[voice] = step + duration
+                    current[voice] = len(notes) - 1
+        return notes
+
+    def __startNote(self, rng, notes, voice, centers, pitches, start, end):
+        low = max(0, centers[voice] - self.REGISTER_RANGE)
+        high = min(127, centers[voice] + self.REGISTER_RANGE)
+        pitch = pitches[voice] + rng.randint(-self.MAX_LEAP, self.MAX_LEAP)
+        # A voice outside of its register, after a swap, moves back towards it by at most an octave a note
+        pitch = min(max(pitch, low), high)
+        pitch = min(max(pitch, pitches[voice] - 12), pitches[voice] + 12)
+        pitches[voice] = pitch
+        notes.append([voice, pitch, start, end])
+
+    # /**
+    #  * Generate a file and write it.
+    #  *
+    #  * @param path The path to write the MIDI file to.
+    #  * @param seed The seed of the random number generator. By default, {@link #seed}.
+    #  * @return The number of notes written.
+    #  */
+
+    def write(self, path, seed=None):
+        seed = self.seed if seed is None else seed
+        notes = self.generateNotes(seed)
+        ticksPerStep = self.PPQ // self.STEPS_PER_BEAT
+
+        midiFile = MidiFile(ticks_per_beat=self.PPQ)
+        # (tick, order, message) with note offs before note ons at the same tick
+        conductor = [(0, 0, MetaMessage('time_signature', numerator=4, denominator=4)),
+                     (0, 0, MetaMessage('set_tempo', tempo=500000))]
+        rng = random.Random(seed)
+        lastTick = self.numBeats * self.PPQ
+        for change in range(1, self.numTempoChanges + 1):
+            tick = lastTick * change // (self.numTempoChanges + 1)
+            conductor.append((tick, 0, MetaMessage('set_tempo', tempo=int(60000000 / rng.uniform(60, 180)))))
+        midiFile.tracks.append(self.__getTrack(conductor))
+
+        for voice in range(self.numVoices):
+            events = []
+            for noteVoice, pitch, start, end in notes:
+                if noteVoice == voice and end > start:
+                    events.append((start * ticksPerStep, 1, Message('note_on', channel=voice, note=pitch,
+                                                                    velocity=self.VELOCITY)))
+                    events.append((end * ticksPerStep, 0, Message('note_off', channel=voice, note=pitch,
+                                                                  velocity=0)))
+            midiFile.tracks.append(self.__getTrack(events))
+        midiFile.save(path)
+        return sum(1 for note in notes if note[3] > note[2])
+
+    @staticmethod
+    def __getTrack(events):
+        track = MidiTrack()
+        tick = 0
+        for eventTick, order, message in sorted(events, key=lambda event: event[:2]):
+            track.append(message.copy(time=eventTick - tick))
+            tick = eventTick
+        return track
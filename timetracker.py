@@ -1,7 +1,8 @@
 # /**
 #  * A <code>TimeTracker</code> is able to interpret MIDI tempo, key, and time signature change events and keep track
 #  * of the song timing in seconds, instead of just using ticks as MIDI events do. It does this by using
-#  * a LinkedList of {@link TimeTrackerNode} objects.
+#  * a LinkedList of {@link TimeTrackerNode} objects. Their start ticks, start times and lengths of a tick are
+#  * also kept in sorted arrays, so that lookups are a binary search.
 #  *
 #  * @author Santiago Martín Cortés - 30 Nov, 2021
 #  * @version 1.0
@@ -9,6 +10,10 @@
 #  */
 
 
+import bisect
+
+import numpy as np
+
 from timetrackernode import TimeTrackerNode
 from timesignature import TimeSignature
 from keysignature import KeySignature
@@ -21,6 +26,9 @@ class TimeTracker:
         self.__lastTick = 0 # The last tick for any event in this song, initially 0.
         self.__nodes = []   # The LinkedList of TimeTrackerNodes of this TimeTracker, ordered by start time.
         self.__nodes.append(TimeTrackerNode(None, 0, self.__PPQ))   # The first node is always the start of the song.
+        self.__startTicks = [0]     # The start tick of each node, for bisection.
+        self.__startTimes = [0]     # The start time of each node, in microseconds.
+        self.__timesPerTick = [0]   # The number of microseconds per tick of each node.
 
     #     /**
     #      * A {@link TimeSignature} event was detected. Deal with it.
@@ -32,9 +40,8 @@ class TimeTracker:
     def addTimeSignatureChange(self, event, tick):
         ts = TimeSignature()
         ts.set_fields(event)
-        if not ts is self.__nodes[-1].getTimeSignature():
-            self.__nodes.append(TimeTrackerNode(self.__nodes[-1], tick, self.__PPQ))
-            self.__nodes[-1].setTimeSignature(ts)
+        if ts != self.__nodes[-1].getTimeSignature():
+            self.__getNodeForChange(tick).setTimeSignature(ts)
 
     #     /**
     #      * A {@link Tempo} event was detected. Deal with it.
@@ -46,9 +53,9 @@ class TimeTracker:
     def addTempoChange(self, event, tick):
         t = Tempo()
         t.set_fields(event)
-        if not t is self.__nodes[-1].getTempo():
-            self.__nodes.append(TimeTrackerNode(self.__nodes[-1], tick, self.__PPQ))
-            self.__nodes[-1].setTempo(t)
+        if t != self.__nodes[-1].getTempo():
+            self.__getNodeForChange(tick).setTempo(t)
+            self.__timesPerTick[-1] = self.__getTimePerTick(t)
 
     #     /**
     #      * A {@link KeySignature} event was detected. Deal with it.
@@ -60,9 +67,47 @@ class TimeTracker:
     def addKeySignatureChange(self, event, tick):
         ks = KeySignature()
         ks.set_fields(event)
-        if not ks is self.__nodes[-1].getKeySignature():
-            self.__nodes.append(TimeTrackerNode(self.__nodes[-1], tick, self.__PPQ))
-            self.__nodes[-1].setKeySignature(ks)
+        if ks != self.__nodes[-1].getKeySignature():
+            self.__getNodeForChange(tick).setKeySignature(ks)
+
+    #     /**
+    #      * Add a node with the given tick, tempo, time signature and key signature, as previously read
+    #      * from {@link #getNodes()}. Its start time is computed from the current last node.
+    #      *
+    #      * @param tick The start tick of the node.
+    #      * @param tempo The {@link Tempo} of the node.
+    #      * @param timeSignature The {@link TimeSignature} of the node.
+    #      * @param keySignature The {@link KeySignature} of the node.
+    #      */
+
+    def addNode(self, tick, tempo, timeSignature, keySignature):
+        node = self.__getNodeForChange(tick)
+        node.setTempo(tempo)
+        node.setTimeSignature(timeSignature)
+        node.setKeySignature(keySignature)
+        self.__timesPerTick[-1] = self.__getTimePerTick(tempo)
+
+    #     /**
+    #      * Get the node to apply a change at the given tick to. Changes must come in tick order. A change at
+    #      * the start tick of the last node is applied to that node, so that several events at the same tick
+    #      * make a single node. Otherwise, a new node is appended.
+    #      *
+    #      * @param tick The tick of the change.
+    #      * @return The TimeTrackerNode to apply the change to.
+    #      */
+
+    def __getNodeForChange(self, tick):
+        if self.__startTicks[-1] == tick:
+            return self.__nodes[-1]
+        node = TimeTrackerNode(self.__nodes[-1], tick, self.__PPQ)
+        self.__nodes.append(node)
+        self.__startTicks.append(tick)
+        self.__startTimes.append(node.getStartTime())
+        self.__timesPerTick.append(self.__getTimePerTick(node.getTempo()))
+        return node
+
+    def __getTimePerTick(self, tempo):
+        return tempo.getMicroSecondsPerQuarter() / self.__PPQ if self.__PPQ else 0
 
     #     /**
     #      * Returns the time in microseconds of a given tick number.
@@ -72,43 +117,33 @@ class TimeTracker:
     #      */
 
     def getTimeAtTick(self, tick):
-        return self.__getNodeAtTick(tick).get_time_at_tick(tick, self.__PPQ)
+        i = self.__getNodeIndexAtTick(tick)
+        return int((tick - self.__startTicks[i]) * self.__timesPerTick[i]) + self.__startTimes[i]
 
     #     /**
-    #      * Get the {@link TimeTrackerNode} which is valid at the given tick.
+    #      * Returns the times in microseconds of the given tick numbers, all at once.
     #      *
-    #      * @param tick The tick.
-    #      * @return The valid TimeTrackerNode.
+    #      * @param ticks The tick numbers to calculate the times of, as a sequence or NumPy array.
+    #      * @return A NumPy int64 array of the times of the given ticks, equal to calling
+    #      * {@link #getTimeAtTick(int)} on each of them.
     #      */
 
-    def __getNodeAtTick(self, tick):
-        i = 1
-        node = self.__nodes[0]
-        while i<len(self.__nodes):
-            node = self.__nodes[i]
-            if node.getStartTick() > tick:
-                i = i-1
-                return i
-            i = i+1
-        return node
+    def getTimesAtTicks(self, ticks):
+        ticks = np.asarray(ticks, dtype=np.int64)
+        startTicks = np.array(self.__startTicks, dtype=np.int64)
+        indices = np.maximum(np.searchsorted(startTicks, ticks, side='right') - 1, 0)
+        offsets = (ticks - startTicks[indices]) * np.array(self.__timesPerTick, dtype=np.float64)[indices]
+        return offsets.astype(np.int64) + np.array(self.__startTimes, dtype=np.int64)[indices]
 
     #     /**
-    #      * Get the TimeTrackerNode which is valid at the given time.
+    #      * Get the index of the {@link TimeTrackerNode} which is valid at the given tick.
     #      *
-    #      * @param time The time.
-    #      * @return The valid TimeTrackerNode.
+    #      * @param tick The tick.
+    #      * @return The index of the valid TimeTrackerNode in {@link #nodes}.
     #      */
 
-    def __getNodeAtTime(self, time):
-        i = 1
-        node = self.__nodes[0]
-        while i < len(self.__nodes):
-            node = self.__nodes[i]
-            if node.getStartTime() > time:
-                i = i - 1
-                return i
-            i = i + 1
-        return node
+    def __getNodeIndexAtTick(self, tick):
+        return max(bisect.bisect_right(self.__startTicks, tick) - 1, 0)
 
     #     /**
     #      * Get a list of the {@link TimeTrackerNode}s tracked by this object.
@@ -145,6 +180,7 @@ class TimeTracker:
 
     def setPPQ(self, ppq):
         self.__PPQ = ppq
+        self.__timesPerTick = [self.__getTimePerTick(node.getTempo()) for node in self.__nodes]
 
     #     /**
     #      * Get the PPQ of this TimeTracker.
@@ -16,18 +16,78 @@
 import math
 
 from mathutils import MathUtils
+from hmmvoicesplittingmodelparameters import HmmVoiceSplittingModelParameters
 
 
 class Voice:
 
+    __slots__ = ('__previous', '__mostRecentNote', '__mostRecentPitch', '__historyLength', '__pitchHistory',
+                 '__weightedPitch', '__numNotes', '__channel', '__channelCount', '__channelCounts',
+                 '__numNotesCorrect')
+
     def _initialize_instance_fields(self):
         self.__previous = None              # The Voice preceding this one.
         self.__mostRecentNote = None        # The most recent {@link MidiNote} of this voice.
+        self.__mostRecentPitch = 0          # The pitch of {@link #mostRecentNote}.
+        self.__historyLength = 0            # The pitch history length the cached weighted pitch was computed with.
+        self.__pitchHistory = ()            # The last {@link #historyLength} pitches of this voice, most recent first.
+        self.__weightedPitch = 0            # The cached value of {@link #getWeightedLastPitch(HmmVoiceSplittingModelParameters)}.
+        self.__numNotes = 0                 # The number of notes in this voice, this one included.
+        self.__channel = None               # The correct voice of {@link #mostRecentNote}.
+        self.__channelCount = 0             # The number of notes of {@link #channel} in this voice.
+        self.__channelCounts = ()           # The note count of each correct voice before this run of {@link #channel}.
+        self.__numNotesCorrect = 0          # The largest note count of any correct voice in this voice.
+
+    # /**
+    #  * Create a new Voice with the given note appended to the given previous Voice.
+    #  * <p>
+    #  * The weighted pitch is computed here, once, from the last historyLength pitches, so that scoring
+    #  * a note against this Voice costs constant time and is shared by every state that contains it.
+    #  *
+    #  * @param note The most recent note of the new Voice.
+    #  * @param prev The Voice preceding this one, or None.
+    #  * @param historyLength The pitch history length to cache the weighted pitch for. Defaults to that
+    #  * of prev, or to {@link HmmVoiceSplittingModelParameters#PITCH_HISTORY_LENGTH_DEFAULT}.
+    #  */
 
-    def __init__(self, note, prev):
+    def __init__(self, note, prev, historyLength=None):
         self._initialize_instance_fields()
         self.__previous = prev
         self.__mostRecentNote = note
+        self.__mostRecentPitch = note.getPitch()
+
+        if historyLength is None:
+            historyLength = HmmVoiceSplittingModelParameters.PITCH_HISTORY_LENGTH_DEFAULT if prev is None \
+                else prev.__historyLength
+        self.__historyLength = historyLength
+
+        if prev is not None and prev.__historyLength == historyLength:
+            self.__pitchHistory = (self.__mostRecentPitch,) + prev.__pitchHistory[:historyLength - 1]
+        else:
+            self.__pitchHistory = tuple(node.__mostRecentPitch for node in self.__walk(historyLength))
+        self.__weightedPitch = self.__weightPitches(self.__pitchHistory)
+
+        # The counts of the other correct voices are shared along a run of notes of the same correct voice,
+        # and only copied when the run ends
+        channel = note.get_correct_voice()
+        self.__channel = channel
+        if prev is None:
+            self.__numNotes = 1
+            self.__channelCount = 1
+            self.__numNotesCorrect = 1
+        else:
+            self.__numNotes = prev.__numNotes + 1
+            if channel == prev.__channel:
+                self.__channelCount = prev.__channelCount + 1
+                self.__channelCounts = prev.__channelCounts
+            else:
+                counts = list(prev.__channelCounts)
+                if len(counts) <= prev.__channel:
+                    counts.extend([0] * (prev.__channel + 1 - len(counts)))
+                counts[prev.__channel] = prev.__channelCount
+                self.__channelCounts = tuple(counts)
+                self.__channelCount = (counts[channel] if channel < len(counts) else 0) + 1
+            self.__numNotesCorrect = max(prev.__numNotesCorrect, self.__channelCount)
 
     # /**
     #  * Get the probability that the given note belongs to this Voice.
@@ -97,18 +157,29 @@ class Voice:
     #  */
 
     def getWeightedLastPitch(self, params):
+        if params.PITCH_HISTORY_LENGTH == self.__historyLength:
+            return self.__weightedPitch
+        pitches = [node.__mostRecentPitch for node in self.__walk(params.PITCH_HISTORY_LENGTH)]
+        return self.__weightPitches(pitches)
+
+    @staticmethod
+    def __weightPitches(pitches):
         weight = 1
         totalWeight = 0
         sum = 0
-        noteNode = self
-        i = 0
-        while i < params.PITCH_HISTORY_LENGTH and noteNode is not None:
-            sum += noteNode.__mostRecentNote.getPitch() * weight
+        for pitch in pitches:
+            sum += pitch * weight
             totalWeight += weight
             weight *= 0.5
+        return sum / totalWeight
+
+    def __walk(self, length):
+        noteNode = self
+        i = 0
+        while i < length and noteNode is not None:
+            yield noteNode
             i += 1
             noteNode = noteNode.__previous
-        return sum / totalWeight
 
     # /**
     #  * Get the number of notes we've correctly grouped into this voice, based on the most common voice in the voice.
@@ -117,58 +188,70 @@ class Voice:
     #  */
 
     def getNumNotesCorrect(self):
-        counts = {}
-        noteNode = self
-        while noteNode is not None:
-            channel = noteNode.__mostRecentNote.get_correct_voice()
-            if channel not in counts.keys():
-                counts.update({channel: 0})
-
-            counts.update({channel: counts[channel] + 1})
-            noteNode = noteNode.__previous
-
-        maxCount = -1
-        for count in counts.values():
-            maxCount = max(maxCount, count)
+        return self.__numNotesCorrect
 
-        return maxCount
+    # /**
+    #  * Get the number of links of this voice which are also links of the given gold standard.
+    #  *
+    #  * @param goldStandard The {@link GoldStandard} of the song.
+    #  * @return The number of correct links in this voice.
+    #  */
 
     def getNumLinksCorrect(self, goldStandard):
         count = 0
-        index = -1
         node = self
         while node.__previous is not None:
-            guessedPrev = node.__previous.__mostRecentNote
-            note = node.__mostRecentNote
-            count += 1
-            if note.get_correct_voice() == guessedPrev.get_correct_voice():
-                channel = note.get_correct_voice()
-                if index == -1:
-                    index = (goldStandard[channel].index(note) if note in goldStandard[channel] else -1)
-
-                if index != 0 and (index < len(goldStandard[channel]) - 1):
-                    if goldStandard[channel][--index] is guessedPrev:
-                        count += 1
-                else:
-                    index = -1
-            else:
-                index = -1
+            if goldStandard.isLink(node.__previous.__mostRecentNote, node.__mostRecentNote):
+                count += 1
             node = node.__previous
         return count
 
     def get_num_notes(self):
-        if self.__previous is None:
-            return 3
-        return 1 + self.__previous.get_num_notes()
+        return self.__numNotes
+
+    # /**
+    #  * Get the notes of this voice, in order, without recursing through {@link #previous}.
+    #  * Notes before a {@link #detachPrevious()} are not included.
+    #  *
+    #  * @return A List of the notes of this voice, from the first to the {@link #mostRecentNote}.
+    #  */
 
     def get_notes(self):
-        list = [] if self.__previous is None else self.__previous.get_notes()
-        list.append(self.__mostRecentNote)
+        list = []
+        noteNode = self
+        while noteNode is not None:
+            list.append(noteNode.__mostRecentNote)
+            noteNode = noteNode.__previous
+        list.reverse()
         return list
 
+    # /**
+    #  * Cut the link from this Voice to its {@link #previous} Voice, so that the notes before this one can be
+    #  * freed. The cached pitch history, weighted pitch, note count and correct note count still cover the
+    #  * whole voice, so scoring is unaffected. {@link #get_notes()} and
+    #  * {@link #getNumLinksCorrect(list)} only see the notes from this one on.
+    #  */
+
+    def detachPrevious(self):
+        self.__previous = None
+
+    # /**
+    #  * Get the signature of the end of this voice. Two voices with the same signature give the same
+    #  * probability to any future note: they share their most recent note, and the pitches used for
+    #  * {@link #getWeightedLastPitch(HmmVoiceSplittingModelParameters)} from now on.
+    #  *
+    #  * @return A hashable signature of this voice's frontier.
+    #  */
+
+    def getFrontierSignature(self):
+        return self.__mostRecentNote, self.__historyLength, self.__pitchHistory
+
     def get_most_recent_note(self):
         return self.__mostRecentNote
 
+    def getMostRecentPitch(self):
+        return self.__mostRecentPitch
+
     def get_previous(self):
         return self.__previous
 